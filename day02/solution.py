@@ -1,6 +1,10 @@
 from unittest import TestCase
 
-from shared.intcode import Intcode, read_data
+import numpy as np
+
+from shared.intcode import Intcode, read_data, find_first, run_batch, VMPool, decoded_instructions
+from shared.intcode_batch import BatchIntcode
+from shared.intcode_symbolic import SymbolicIntcode, solve
 
 
 class TestSilver(TestCase):
@@ -32,3 +36,69 @@ class TestGold(TestCase):
                         100 * noun + verb,
                         9425
                     )
+
+    def test_assignement_batch(self):
+        nouns, verbs = np.divmod(np.arange(100 * 100), 100)
+        batch = BatchIntcode(read_data(), lanes=len(nouns))
+        batch.memory[:, 1] = nouns
+        batch.memory[:, 2] = verbs
+        batch.run_program()
+        match = np.flatnonzero(batch.memory[:, 0] == 19690720)[0]
+        self.assertEqual(
+            100 * nouns[match] + verbs[match],
+            9425
+        )
+
+    def test_assignement_parallel(self):
+        pairs = [(noun, verb) for noun in range(100) for verb in range(100)]
+        index, _ = find_first(
+            read_data(),
+            lambda result: result == 19690720,
+            patches=[{1: noun, 2: verb} for noun, verb in pairs]
+        )
+        noun, verb = pairs[index]
+        self.assertEqual(
+            100 * noun + verb,
+            9425
+        )
+
+    def test_assignement_run_batch(self):
+        pairs = [(12, 2), (94, 25), (0, 0)]
+        self.assertEqual(
+            run_batch(read_data(), patches=[{1: noun, 2: verb} for noun, verb in pairs], workers=2, chunksize=1),
+            [3085697, 19690720, 655695]
+        )
+
+    def test_run_batch_inputs(self):
+        self.assertEqual(
+            run_batch([3, 0, 4, 0, 99], inputs=[[1], [2], [3]], workers=2),
+            [[1], [2], [3]]
+        )
+
+    def test_assignement_symbolic(self):
+        result = SymbolicIntcode(read_data(), {1: 'noun', 2: 'verb'}).run_program()
+        solution = solve(result, 19690720, {'noun': range(100), 'verb': range(100)})
+        self.assertEqual(
+            100 * solution['noun'] + solution['verb'],
+            9425
+        )
+
+    def test_decoded_instructions_shared(self):
+        data = read_data()
+        data[1], data[2] = 94, 25
+        self.assertEqual(Intcode(data).run_program(), 19690720)
+        decoded = len(decoded_instructions)
+        self.assertEqual(Intcode(data).run_program(), 19690720)
+        self.assertEqual(len(decoded_instructions), decoded)
+
+    def test_assignement_pool(self):
+        pool = VMPool(read_data())
+        for noun in range(100):
+            for verb in range(100):
+                intcode = pool.acquire(memory_patches={1: noun, 2: verb})
+                if intcode.run_program() == 19690720:
+                    self.assertEqual(
+                        100 * noun + verb,
+                        9425
+                    )
+                pool.release(intcode)
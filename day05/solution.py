@@ -1,6 +1,10 @@
+import json
 from unittest import TestCase
+from unittest.mock import patch
 
-from shared.intcode import Intcode, read_data
+from shared.intcode import Intcode, read_data, Profiler
+from shared.intcode_analysis import Analysis
+from shared.intcode_batch import BatchIntcode
 
 
 class TestSilver(TestCase):
@@ -10,6 +14,41 @@ class TestSilver(TestCase):
             [3862]
         )
 
+    def test_example_a_batch(self):
+        # lanes with a different number of inputs
+        batch = BatchIntcode([3, 0, 4, 0, 99], [[3862], []])
+        self.assertEqual(batch.run_program(), [[3862], []])
+        self.assertEqual(list(batch.input_required), [False, True])
+        batch.add_input([[], [42]])
+        self.assertEqual(batch.run_program(), [[3862], [42]])
+
+    def test_example_a_profiled(self):
+        intcode = Intcode([3, 0, 4, 0, 99], [])
+        intcode.profiler = Profiler()
+        intcode.run_program()
+        self.assertEqual(intcode.profiler.input_waits, 1)
+        self.assertEqual(sum(intcode.profiler.opcodes.values()), 0)
+
+        intcode.add_input([3862])
+        self.assertEqual(intcode.run_program(), [3862])
+        profiler = intcode.profiler
+        self.assertEqual(profiler.opcodes, {3: 1, 4: 1, 99: 1})
+        self.assertEqual(profiler.pointers, {0: 1, 2: 1, 4: 1})
+        self.assertEqual(len(profiler.run_times), 2)
+        self.assertIn('run_program calls: 2', profiler.report())
+        self.assertIn('input waits: 1, instructions: 3', profiler.report())
+        self.assertEqual(
+            {key: value for key, value in json.loads(profiler.to_json()).items() if key != 'run_times'},
+            {'opcodes': {'3': 1, '4': 1, '99': 1}, 'pointers': {'0': 1, '2': 1, '4': 1}, 'input_waits': 1}
+        )
+
+    def test_example_a_unprofiled(self):
+        # without a profiler the run does not go through it at all
+        intcode = Intcode([3, 0, 4, 0, 99], [3862])
+        with patch.object(Profiler, 'run', side_effect=AssertionError):
+            self.assertEqual(intcode.run_program(), [3862])
+        self.assertIsNone(intcode.profiler)
+
     def test_example_b(self):
         self.assertEqual(
             Intcode(
@@ -24,6 +63,15 @@ class TestSilver(TestCase):
             [0, 0, 0, 0, 0, 0, 0, 0, 0, 13285749]
         )
 
+    def test_assignment_analysis(self):
+        # the input is added to the instruction at 6 before it runs
+        analysis = Analysis(read_data())
+        self.assertEqual(analysis.unresolved, {6})
+        self.assertEqual(analysis.self_modifying, {6})
+        self.assertIn(6, analysis.code)
+        self.assertEqual(analysis.data, [(225, 226)])
+        self.assertEqual(analysis.unknown, [(7, 225), (226, 678)])
+
 
 class TestGold(TestCase):
     def test_example_1(self):
@@ -134,3 +182,19 @@ class TestGold(TestCase):
             Intcode(read_data(), [5]).run_program(),
             [5000972]
         )
+
+    def test_assignement_forked(self):
+        # both forks patch the instruction at 6 differently, each with a decode cache shared until then
+        intcode = Intcode(read_data(), [])
+        intcode.run_program()
+        test_mode = intcode.fork()
+        test_mode.add_input([1])
+        thermal_mode = intcode.fork()
+        thermal_mode.add_input([5])
+        self.assertEqual(list(thermal_mode.run_program()), [5000972])
+        self.assertEqual(list(test_mode.run_program())[-1], 13285749)
+        intcode.add_input([5])
+        self.assertEqual(list(intcode.run_program()), [5000972])
+
+        thermal_mode.reset(inputs=[1])
+        self.assertEqual(list(thermal_mode.run_program())[-1], 13285749)
@@ -1,24 +1,47 @@
 from itertools import permutations
+from typing import Tuple
 from unittest import TestCase
 
-from shared.intcode import Intcode, read_data
+from shared.intcode import Intcode, read_data, Pipeline
+from shared.intcode_analysis import Analysis
 
 
 def amplification_sequence(phase_sequence, program):
-    amplifiers = [
-        Intcode(program, [phase])
-        for phase in phase_sequence
-    ]
-    output = [0]
-    current_amplifier = 0
-    while not amplifiers[current_amplifier].halted:
-        amplifiers[current_amplifier].add_input(output)
-        output = amplifiers[current_amplifier].run_program()
-        print('amplifier ', current_amplifier, ' output ', output)
-        amplifiers[current_amplifier].output = []
-        current_amplifier = (current_amplifier + 1) % len(phase_sequence)
-
-    return output[0]
+    pipeline = Pipeline(
+        [
+            Intcode(program, [phase])
+            for phase in phase_sequence
+        ],
+        feedback=True
+    )
+    pipeline.push([0])
+    return pipeline.run()[-1]
+
+
+# Walks the permutations depth first, so every prefix of phases runs its
+# amplifiers once and all permutations starting with it reuse the signal.
+class PhaseSearch:
+    def __init__(self, program, phases):
+        # forked for every amplifier instead of loading the program again
+        self.fresh = Intcode(program, [])
+        self.phases = phases
+        self.runs = 0
+
+    def best(self) -> Tuple[int, Tuple[int, ...]]:
+        return self.search(0, ())
+
+    def search(self, signal, sequence) -> Tuple[int, Tuple[int, ...]]:
+        remaining = [phase for phase in self.phases if phase not in sequence]
+        if not remaining:
+            return signal, sequence
+        results = []
+        for phase in remaining:
+            amplifier = self.fresh.fork()
+            amplifier.add_input([phase, signal])
+            amplifier.run_program()
+            self.runs += 1
+            results.append(self.search(amplifier.output.pop(), sequence + (phase,)))
+        return max(results)
 
 
 class TestSilver(TestCase):
@@ -31,6 +54,34 @@ class TestSilver(TestCase):
             43210
         )
 
+    def test_example_1_chained(self):
+        program = [3, 15, 3, 16, 1002, 16, 10, 16, 1, 16, 15, 15, 4, 15, 99, 0, 0]
+        pipeline = Pipeline([
+            Intcode(program, [phase])
+            for phase in [4, 3, 2, 1, 0]
+        ])
+        pipeline.push([0])
+
+        self.assertEqual(
+            list(pipeline.run()),
+            [43210]
+        )
+        self.assertTrue(pipeline.halted())
+
+    def test_pipeline_bounded_output(self):
+        pipeline = Pipeline([Intcode([104, 1, 104, 2, 99], [], output_capacity=1)])
+
+        self.assertEqual(list(pipeline.run()), [1])
+        self.assertFalse(pipeline.halted())
+        pipeline.output.pop()
+        self.assertEqual(list(pipeline.run()), [2])
+        pipeline.output.pop()
+        pipeline.run()
+        self.assertTrue(pipeline.halted())
+
+        with self.assertRaises(Exception):
+            Pipeline([Intcode([104, 1, 99], [], output_capacity=1), Intcode([3, 0, 99], [])])
+
     def test_example_2(self):
         program = [
             3, 23, 3, 24, 1002, 24, 10, 24, 1002, 23, -1, 23,
@@ -66,6 +117,23 @@ class TestSilver(TestCase):
             272368
         )
 
+    def test_assignment_prefix_search(self):
+        search = PhaseSearch(read_data(), range(5))
+
+        self.assertEqual(
+            search.best(),
+            (272368, (1, 4, 2, 0, 3))
+        )
+        self.assertEqual(search.runs, 325)
+
+    def test_assignment_analysis(self):
+        # the phase is added to the address of the jump at 6, the amplifiers behind it are not known
+        analysis = Analysis(read_data())
+        self.assertEqual(sorted(analysis.instructions), [0, 2, 6])
+        self.assertEqual(analysis.self_modifying, {8})
+        self.assertEqual(analysis.data, [])
+        self.assertEqual(analysis.unknown, [(9, len(analysis.program))])
+
 
 class TestGold(TestCase):
     def test_example_1(self):
@@ -1,6 +1,11 @@
+import os
+from tempfile import TemporaryDirectory
 from unittest import TestCase
 
-from shared.intcode import Intcode, read_data
+from shared.intcode import Intcode, read_data, images, SIDECAR_SUFFIX, Profiler
+from shared.intcode_analysis import Analysis
+from shared.intcode_batch import BatchIntcode
+from shared.intcode_compiler import CompiledIntcode
 
 
 class TestSilver(TestCase):
@@ -13,6 +18,58 @@ class TestSilver(TestCase):
             [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99]
         )
 
+    def test_example_1_bounded_output(self):
+        program = [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99]
+        intcode = Intcode(program, [], output_capacity=5)
+        outputs = []
+        while not intcode.halted:
+            intcode.run_program()
+            self.assertLessEqual(len(intcode.output), 5)
+            if not intcode.halted:
+                self.assertTrue(intcode.output_blocked)
+                self.assertTrue(intcode.output.full())
+            outputs += intcode.output.drain()
+        self.assertEqual(outputs, program)
+
+    def test_run_until_outputs(self):
+        program = [104, 1, 3, 20, 4, 20, 99]
+        requests = []
+        intcode = Intcode(program, [], input_provider=lambda intcode: requests.append(intcode.pointer) or 7)
+        self.assertEqual(intcode.run_until_outputs(1), [1])
+        self.assertEqual(intcode.pointer, 2)
+        self.assertEqual(requests, [])
+        self.assertEqual(list(intcode.outputs()), [7])
+        self.assertEqual(requests, [2])
+        self.assertTrue(intcode.halted)
+
+        intcode = Intcode(program, [5])
+        intcode.profiler = Profiler()
+        self.assertEqual(intcode.run_until_outputs(1), [1])
+        self.assertEqual(intcode.pointer, 2)
+        self.assertEqual(intcode.profiler.opcodes, {4: 1})
+
+    def test_fork_input_iterator(self):
+        program = [3, 20, 4, 20, 3, 20, 4, 20, 3, 20, 4, 20, 99]
+        intcode = Intcode(program, [], input_provider=iter([1, 2]))
+        self.assertEqual(intcode.run_until_outputs(1), [1])
+        fork = intcode.fork()
+        self.assertEqual(list(intcode.outputs()), [2])
+        self.assertTrue(intcode.input_required)
+        self.assertTrue(intcode.fork().input_required)
+        self.assertEqual(list(fork.outputs()), [2])
+
+    def test_output_compared_to_value(self):
+        output = Intcode([104, 5, 99], []).run_program()
+        self.assertFalse(output == 5)
+        self.assertNotEqual(output, None)
+        self.assertEqual(output, (5,))
+
+    def test_example_1_analysis(self):
+        analysis = Analysis([109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99])
+        self.assertEqual(analysis.written, {100, 101})
+        self.assertEqual(analysis.loops, [(0, 0)])
+        self.assertEqual(analysis.data, [])
+
     def test_example_2(self):
         self.assertEqual(
             len(str(
@@ -24,6 +81,14 @@ class TestSilver(TestCase):
             16
         )
 
+    def test_example_2_batch(self):
+        batch = BatchIntcode([1102, 34915192, 34915192, 7, 4, 7, 99, 0])
+        self.assertEqual(batch.run_program(), [[34915192 * 34915192]])
+        with self.assertRaises(Exception):
+            BatchIntcode([1102, 34915192 ** 2, 34915192, 7, 4, 7, 99, 0]).run_program()
+        with self.assertRaises(Exception):
+            BatchIntcode([1101, 2 ** 62, 2 ** 62, 7, 4, 7, 99, 0]).run_program()
+
     def test_example_3(self):
         self.assertEqual(
             Intcode(
@@ -42,6 +107,91 @@ class TestSilver(TestCase):
             [1]
         )
 
+    def test_counted_loop(self):
+        intcode = Intcode([1001, 17, 1, 17, 1007, 17, 1000000000, 18, 1005, 18, 0, 4, 17, 99, 0, 0, 0, 0, 0], [])
+        intcode.loop_acceleration = True
+        self.assertEqual(intcode.run_program(), [1000000000])
+
+    def test_counted_loop_interpreted(self):
+        program = [1, 20, 21, 20, 1001, 22, 2, 22, 8, 22, 23, 24, 1006, 24, 0, 4, 20, 4, 22, 99, 5, 3, 0, 40, 0]
+        accelerated = Intcode(program, [])
+        accelerated.loop_acceleration = True
+        self.assertEqual(
+            list(accelerated.run_program()),
+            list(Intcode(program, []).run_program())
+        )
+
+    def test_counted_loop_profiled(self):
+        program = [1001, 17, 1, 17, 1007, 17, 1000, 18, 1005, 18, 0, 4, 17, 99, 0, 0, 0, 0, 0]
+        intcode = Intcode(program, [])
+        intcode.loop_acceleration = True
+        intcode.profiler = Profiler()
+        self.assertEqual(list(intcode.run_program()), [1000])
+        self.assertEqual(intcode.profiler.opcodes, {1: 1000, 7: 1000, 5: 1000, 4: 1, 99: 1})
+
+    def test_counted_loop_budget(self):
+        program = [1001, 17, 1, 17, 1007, 17, 1000, 18, 1005, 18, 0, 4, 17, 99, 0, 0, 0, 0, 0]
+        intcode = Intcode(program, [])
+        intcode.loop_acceleration = True
+        self.assertEqual(intcode.run(10), 10)
+        self.assertFalse(intcode.halted)
+        self.assertEqual(intcode.memory[17], 4)
+        self.assertEqual(intcode.run(), 2992)
+        self.assertEqual(intcode.steps, 3002)
+        self.assertEqual(list(intcode.output), [1000])
+
+    def test_budget_counts_instructions(self):
+        expected = []
+        for profiled in (True, False):
+            intcode = Intcode(read_data(), [2])
+            if profiled:
+                intcode.profiler = Profiler()
+            while not intcode.halted:
+                steps = intcode.run(3)
+                self.assertTrue(steps == 3 or intcode.halted)
+            expected.append((intcode.steps, list(intcode.output)))
+        self.assertEqual(expected, [(371206, [58534])] * 2)
+
+    def test_sidecar(self):
+        program = [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99]
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'data.txt')
+            with open(path, 'w') as file:
+                file.write(','.join(map(str, program)) + '\n')
+            self.assertEqual(read_data(path), program)
+            self.assertEqual(os.path.getsize(path + SIDECAR_SUFFIX), 8 * (2 + len(program)))
+
+            images.clear()
+            self.assertEqual(read_data(path), program)
+
+            # a sidecar that was cut off is parsed again and rewritten
+            with open(path + SIDECAR_SUFFIX, 'r+b') as file:
+                file.truncate(80)
+            images.clear()
+            self.assertEqual(read_data(path), program)
+            self.assertEqual(os.path.getsize(path + SIDECAR_SUFFIX), 8 * (2 + len(program)))
+            self.assertEqual(sorted(os.listdir(directory)), ['data.txt', 'data.txt' + SIDECAR_SUFFIX])
+
+    def test_profiler_fused(self):
+        counts = []
+        for fusion in (True, False):
+            intcode = Intcode(read_data(), [1])
+            intcode.fusion = fusion
+            intcode.profiler = Profiler()
+            intcode.run_program()
+            counts.append((intcode.profiler.opcodes, intcode.profiler.pointers))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(sum(counts[0][0].values()), 205)
+        self.assertEqual(counts[0][0][5], 36)
+
+    def test_fused_jump_rewritten(self):
+        # the add rewrites the condition parameter of the jump after it
+        program = [1101, 0, 8, 5, 1005, 5, 11, 104, 0, 99, 0, 104, 1, 99]
+        intcode = Intcode(program, [])
+        intcode.fusion = True
+        self.assertEqual(intcode.run_program(), [0])
+        self.assertEqual(intcode.run_program(), Intcode(program, []).run_program())
+
     # 203 is to low
     def test_assignement(self):
         self.assertEqual(
@@ -62,3 +212,12 @@ class TestGold(TestCase):
             ).run_program(),
             [58534]
         )
+
+    def test_assignement_compiled(self):
+        self.assertEqual(
+            CompiledIntcode(
+                read_data(),
+                [2]
+            ).run_program(),
+            [58534]
+        )
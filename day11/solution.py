@@ -53,18 +53,23 @@ class Hull:
 
 
 def solve(hull):
-    intcode = Intcode(read_data(), inputs=[])
     robot = Robot((0, 0), UP)
-    while not intcode.halted:
-        intcode.run_program()
-        if len(intcode.output) >= 2:
-            color = intcode.output.pop(0)
-            turn = intcode.output.pop(0)
+
+    def follow_instructions(intcode):
+        if len(intcode.output) == 2:
+            color, turn = intcode.output.drain()
             hull.paint(robot.position, color)
             robot.turn(turn)
             robot.move()
 
-        intcode.add_input([hull.get_color(robot.position)])
+    # the camera is read every time the program asks for it
+    def camera(intcode):
+        follow_instructions(intcode)
+        return hull.get_color(robot.position)
+
+    intcode = Intcode(read_data(), inputs=[], input_provider=camera)
+    intcode.run_program()
+    follow_instructions(intcode)
 
 
 class TestSilver(TestCase):
@@ -19,10 +19,9 @@ class TestSilver(TestCase):
 class Arcade:
     def __init__(self, program):
         self.intcode = Intcode(program, inputs=[0, 0, 0])
-        data = self.intcode.run_program()
-        self.state = self.parse_output(data)
+        self.state = {}
+        self.update_state()
         self.max_x, self.max_y = max(self.state.keys())
-        self.intcode.output = []
 
     @staticmethod
     def parse_output(data):
@@ -86,9 +85,27 @@ class Arcade:
 
     def move_joystick(self, move):
         self.intcode.add_input([move])
-        for coords, tile_id in Arcade.parse_output(self.intcode.run_program()).items():
-            self.state[coords] = tile_id
-        self.intcode.output = []
+        self.update_state()
+
+    def update_state(self) -> None:
+        outputs = self.intcode.outputs()
+        self.store_tiles(zip(outputs, outputs, outputs))
+
+    def store_tiles(self, tiles) -> None:
+        for x, y, tile_id in tiles:
+            self.state[(x, y)] = tile_id
+
+    # the joystick follows the ball every time the game asks for it, without leaving the program
+    def play(self) -> int:
+        def joystick(intcode):
+            output = intcode.output.drain()
+            self.store_tiles(zip(output[::3], output[1::3], output[2::3]))
+            return compare(self.find(4)[0], self.find(3)[0])
+
+        self.intcode.input_provider = joystick
+        self.intcode.run_program()
+        self.update_state()
+        return self.score()
 
     def draw_state(self, screen) -> None:
         colors = {
@@ -129,6 +146,12 @@ class TestGold(TestCase):
             13989
         )
 
+    def test_assignement_play(self):
+        self.assertEqual(
+            Arcade.create().play(),
+            13989
+        )
+
     def test_manual(self):
         arcade = Arcade.create()
         arcade.run()
@@ -53,19 +53,14 @@ class RepairDroid:
         self.fewest_movements = 0
 
     def solve_silver(self):
-        response = EMPTY
-        while response != OXYGEN:
-            response = self.move()
+        self.drive(lambda response: response == OXYGEN)
         self.print_map()
         return self.fewest_movements
 
     def solve_gold(self):
-        response = EMPTY
-        while response != OXYGEN:
-            response = self.move()
+        self.drive(lambda response: response == OXYGEN)
         oxygen_boundary = [self.current_location]
-        while self.current_location != (0, 0):
-            self.move()
+        self.drive(lambda response: self.current_location == (0, 0))
         time = 0
         while '.' in self.map.values():
             oxygen_boundary = [
@@ -79,8 +74,22 @@ class RepairDroid:
             time += 1
         return time
 
+    # the droid asks for its next direction right after reporting on the previous one
+    def drive(self, done) -> None:
+        def controller(intcode):
+            if intcode.output:
+                if done(self.handle_response(intcode.output.pop())):
+                    return None
+            return self.current_direction
+
+        self.intcode.input_provider = controller
+        self.intcode.run_program()
+        self.intcode.input_provider = None
+
     def move(self):
-        response = self.send_move_command(self.current_direction)
+        return self.handle_response(self.send_move_command(self.current_direction))
+
+    def handle_response(self, response):
         destination = movements[self.current_direction](self.current_location)
         if response == EMPTY:
             if destination in self.map.keys():
@@ -103,10 +112,7 @@ class RepairDroid:
 
     def send_move_command(self, direction):
         self.intcode.add_input([direction])
-        self.intcode.run_program()
-        response = self.intcode.output[0]
-        self.intcode.output = []
-        return response
+        return self.intcode.run_until_outputs(1)[0]
 
     def print_map(self):
         x_min = min(self.map.keys(), key=lambda coords: coords[0])[0]
@@ -120,6 +126,33 @@ class RepairDroid:
             print()
 
 
+def explore(intcode: Intcode, start=(0, 0)):
+    distances = {start: 0}
+    oxygen = None
+    visited = {start}
+    frontier = [(start, intcode)]
+    while frontier:
+        next_frontier = []
+        for location, intcode in frontier:
+            for direction, movement in movements.items():
+                destination = movement(location)
+                if destination in visited:
+                    continue
+                visited.add(destination)
+                branch = intcode.fork()
+                branch.add_input([direction])
+                branch.run_program()
+                response = branch.output.pop()
+                if response == WALL:
+                    continue
+                if response == OXYGEN:
+                    oxygen = (destination, branch)
+                distances[destination] = distances[location] + 1
+                next_frontier.append((destination, branch))
+        frontier = next_frontier
+    return distances, oxygen
+
+
 class TestSilver(TestCase):
     # 215 is too low: forgot the command to reach the oxygen
     def test_assignement(self):
@@ -129,6 +162,15 @@ class TestSilver(TestCase):
             216
         )
 
+    def test_assignement_explore(self):
+        intcode = Intcode(read_data(), [])
+        intcode.run_program()
+        distances, (oxygen, _) = explore(intcode)
+        self.assertEqual(
+            distances[oxygen],
+            216
+        )
+
 
 class TestGold(TestCase):
     def test_assignement(self):
@@ -137,3 +179,13 @@ class TestGold(TestCase):
             droid.solve_gold(),
             326
         )
+
+    def test_assignement_explore(self):
+        intcode = Intcode(read_data(), [])
+        intcode.run_program()
+        _, (oxygen, oxygen_intcode) = explore(intcode)
+        distances, _ = explore(oxygen_intcode, start=oxygen)
+        self.assertEqual(
+            max(distances.values()),
+            326
+        )
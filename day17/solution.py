@@ -1,6 +1,6 @@
 from unittest import TestCase
 
-from shared.intcode import read_data, Intcode
+from shared.intcode import read_data, Intcode, AsciiTerminal
 
 
 def find_scafolds(output):
@@ -107,7 +107,7 @@ class TestGold(TestCase):
         intcode = Intcode(read_data(), [])
         output = intcode.run_program()
 
-        print(''.join([chr(char) for char in output]))
+        print(intcode.output_ascii())
 
         command = command_sequence(direction_robot, output, segments)
 
@@ -124,21 +124,14 @@ class TestGold(TestCase):
         full_input = command + '\n' + sequences['A'] + '\n' + sequences['B'] + '\n' + sequences['C'] + '\n' + 'n' + '\n'
         print(full_input)
 
-        input_commands = [
-            ord(char)
-            for char in full_input
-        ]
-
-        print(input_commands)
-
         data = read_data()
         data[0] = 2
-        intcode = Intcode(data, input_commands)
-        output = intcode.run_program()
-
-        # print(''.join([chr(char) for char in output]))
+        terminal = AsciiTerminal(Intcode(data, []))
+        terminal.send(full_input)
+        terminal.intcode.run_program()
+        terminal.decode()
 
         self.assertEqual(
-            output[-1],
+            terminal.values[-1],
             1289413
         )
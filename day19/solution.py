@@ -2,7 +2,8 @@ from unittest import TestCase
 
 import numpy as np
 
-from shared.intcode import read_data, Intcode
+from shared.intcode import read_data, Intcode, RunCache
+from shared.intcode_batch import BatchIntcode
 
 
 class bcolors:
@@ -32,6 +33,15 @@ class TestSilver(TestCase):
             np.count_nonzero(map == 1)
         )
 
+    def test_assignement_batch(self):
+        batch = BatchIntcode(read_data(), [[i, j] for i in range(50) for j in range(50)])
+        batch.run_program()
+
+        self.assertEqual(
+            183,
+            sum(output[0] for output in batch.output)
+        )
+
 
 def determine_left_wing(closest_point, size=100):
     return closest_point[0], closest_point[1] + size - 1
@@ -41,42 +51,54 @@ def determine_right_wing(closest_point, size=100):
     return closest_point[0] + size - 1, closest_point[1]
 
 
-def is_outside_beam(point, code):
-    intcode = Intcode(code.copy(), [])
-    intcode.add_input([point[0], point[1]])
-    intcode.run_program()
-    return intcode.output[-1] == 0
+def is_outside_beam(point, beam: RunCache):
+    return beam.run([point[0], point[1]])[-1] == 0
 
 
-def lef_wing_is_outside_beam(closest_point, data):
+def lef_wing_is_outside_beam(closest_point, beam):
     left_wing = determine_left_wing(closest_point)
-    return is_outside_beam(point=left_wing, code=data)
+    return is_outside_beam(point=left_wing, beam=beam)
 
 
-def right_wing_is_outside_beam(closest_point, data):
+def right_wing_is_outside_beam(closest_point, beam):
     right_wing = determine_right_wing(closest_point)
-    return is_outside_beam(point=right_wing, code=data)
+    return is_outside_beam(point=right_wing, beam=beam)
 
 
 # 19161086 is to high
 class TestGold(TestCase):
     def test_assignement(self):
-        data = read_data()
+        beam = RunCache(read_data())
         closest_point = (1, 1)
         while (
-                lef_wing_is_outside_beam(closest_point, data)
+                lef_wing_is_outside_beam(closest_point, beam)
                 or
-                right_wing_is_outside_beam(closest_point, data)
+                right_wing_is_outside_beam(closest_point, beam)
         ):
-            while lef_wing_is_outside_beam(closest_point, data):
+            while lef_wing_is_outside_beam(closest_point, beam):
                 closest_point = (closest_point[0] + 1, closest_point[1])
-            while right_wing_is_outside_beam(closest_point, data):
+            while right_wing_is_outside_beam(closest_point, beam):
                 closest_point = (closest_point[0], closest_point[1] + 1)
         self.assertEqual(
             closest_point[0] * 10_000 + closest_point[1],
             11221248
         )
 
+    def test_run_cache(self):
+        beam = RunCache(read_data(), capacity=2)
+        self.assertEqual(beam.run([0, 0]), [1])
+        beam.run([0, 0]).append(42)
+        self.assertEqual(beam.run([0, 0]), [1])
+        self.assertEqual((beam.hits, beam.misses), (2, 1))
+
+        beam.run([1, 0])
+        beam.run([0, 0])
+        # [0, 0] was used last, so [1, 0] is evicted
+        beam.run([0, 1])
+        self.assertEqual(list(beam.results), [((), (0, 0)), ((), (0, 1))])
+        beam.run([1, 0])
+        self.assertEqual((beam.hits, beam.misses), (3, 4))
+
     def test_assignement_print_area(self):
         start = 50
 
@@ -2,7 +2,7 @@ from abc import ABC, abstractmethod
 from typing import List, Dict
 from unittest import TestCase
 
-from shared.intcode import Intcode, read_data
+from shared.intcode import Intcode, read_data, AsciiTerminal
 
 
 class Rule(ABC):
@@ -152,16 +152,16 @@ class TestSilver(TestCase):
         )
 
     def test_assignement(self):
-        intcode = Intcode(read_data(), [])
+        terminal = AsciiTerminal(Intcode(read_data(), []))
         print('--- start printing rules ---\n' + str(walking) + '\n--- finished printing rules ---')
-        intcode.input_ascii(
+        terminal.send(
             str(walking)
         )
-        intcode.run_program()
-        print(intcode.output_ascii())
+        for line in terminal.lines():
+            print(line)
         self.assertEqual(
             19357534,
-            intcode.output[-1]
+            terminal.values[-1]
         )
 
 
@@ -204,14 +204,14 @@ class TestGold(TestCase):
         )
 
     def test_assignement(self):
-        intcode = Intcode(read_data(), [])
+        terminal = AsciiTerminal(Intcode(read_data(), []))
         print('--- start printing rules ---\n' + str(running) + '\n--- finished printing rules ---')
-        intcode.input_ascii(
+        terminal.send(
             str(running)
         )
-        intcode.run_program()
-        print(intcode.output_ascii())
+        for line in terminal.lines():
+            print(line)
         self.assertEqual(
             1142814363,
-            intcode.output[-1]
+            terminal.values[-1]
         )
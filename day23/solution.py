@@ -1,16 +1,21 @@
+import asyncio
 from collections import defaultdict
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from unittest import TestCase
 
-from shared.intcode import read_data, Intcode
+from shared.intcode import read_data, Intcode, Scheduler
+from shared.intcode_async import AsyncIntcode, all_idle
 
 
 class Network:
-    def __init__(self, num_computers: int, program: List[int]):
+    def __init__(self, num_computers: int, program: List[int], quantum: int = 1000):
         self.computers = [
             Intcode(instructions=program.copy(), inputs=[i])
             for i in range(num_computers)
         ]
+        self.scheduler = Scheduler(quantum)
+        for computer in self.computers:
+            self.scheduler.add(computer)
         self.packets: Dict[int, List[List[int]]] = defaultdict(lambda: [])
         self.rounds_idle = 0
         self.nat_delivered_packets = []
@@ -25,24 +30,28 @@ class Network:
     def tick(self):
         packets = self.pop_packets()
         for current_address in range(len(self.computers)):
-            self.computers[current_address].add_input(packets[current_address])
+            # a computer still busy with its time slices is only told there is nothing once it asks
+            if packets[current_address] != [-1] or self.computers[current_address].input_required:
+                self.computers[current_address].add_input(packets[current_address])
 
-        for current_address in range(len(self.computers)):
-            self.computers[current_address].run_program()
+        self.scheduler.run_round()
 
         had_output = False
         for current_address in range(len(self.computers)):
-            for i in range(int(len(self.computers[current_address].output) / 3)):
+            # a computer can be halfway a packet when its time slice ends
+            computer_output = self.computers[current_address].output
+            output = [computer_output.pop() for _ in range(len(computer_output) // 3 * 3)]
+            for i in range(int(len(output) / 3)):
                 had_output = True
-                destination, x, y = self.computers[current_address].output[i * 3:i * 3 + 3]
+                destination, x, y = output[i * 3:i * 3 + 3]
                 self.packets[destination].append([x, y])
                 if destination >= len(self.computers):
                     print(
                         f'computer {current_address:2} sending [{x}, {y}] to {destination}')
-            self.computers[current_address].output = []
 
         # if was idle
-        if any([packet != [-1] for packet in packets]) == 0 and not had_output:
+        waiting = all(computer.input_required for computer in self.computers)
+        if any([packet != [-1] for packet in packets]) == 0 and not had_output and waiting and self.packets[255]:
             if self.rounds_idle >= 5:
                 nat_packet = self.packets[255][-1]
                 self.packets[0].append(nat_packet)
@@ -63,9 +72,9 @@ def solve_silver() -> List[List[int]]:
     return network.packets[255]
 
 
-def solve_gold() -> List[int]:
+def solve_gold(quantum: int = 1000) -> List[int]:
     data = read_data()
-    network = Network(num_computers=50, program=data)
+    network = Network(num_computers=50, program=data, quantum=quantum)
     # for _ in range(1000):
     while len(network.nat_delivered_packets) < 2 or (network.nat_delivered_packets[-1] != network.nat_delivered_packets[-2]):
         network.tick()
@@ -81,6 +90,46 @@ def solve_gold() -> List[int]:
     return network.nat_delivered_packets[-1]
 
 
+async def run_network(num_computers: int, program: List[int]) -> Tuple[List[List[int]], List[List[int]]]:
+    nat_packets = []
+    nat_delivered_packets = []
+    idle = asyncio.Event()
+
+    # called whenever a computer starts waiting and after every routed packet
+    def check_idle():
+        if nat_packets and all_idle(computers):
+            idle.set()
+
+    computers = [
+        AsyncIntcode(Intcode(instructions=program, inputs=[address]), idle_input=-1, on_idle=check_idle)
+        for address in range(num_computers)
+    ]
+
+    async def route(computer: AsyncIntcode):
+        while True:
+            destination = await computer.outputs.get()
+            x = await computer.outputs.get()
+            y = await computer.outputs.get()
+            if destination == 255:
+                nat_packets.append([x, y])
+            else:
+                computers[destination].inputs.put_nowait(x)
+                computers[destination].inputs.put_nowait(y)
+            check_idle()
+
+    tasks = [asyncio.create_task(computer.run()) for computer in computers]
+    tasks += [asyncio.create_task(route(computer)) for computer in computers]
+    while len(nat_delivered_packets) < 2 or nat_delivered_packets[-1] != nat_delivered_packets[-2]:
+        await idle.wait()
+        idle.clear()
+        computers[0].inputs.put_nowait(nat_packets[-1][0])
+        computers[0].inputs.put_nowait(nat_packets[-1][1])
+        nat_delivered_packets.append(nat_packets[-1])
+    for task in tasks:
+        task.cancel()
+    return nat_packets, nat_delivered_packets
+
+
 class TestSilver(TestCase):
     def test_assignement(self):
         self.assertListEqual(
@@ -88,6 +137,13 @@ class TestSilver(TestCase):
             solve_silver()
         )
 
+    def test_assignement_async(self):
+        nat_packets, _ = asyncio.run(run_network(num_computers=50, program=read_data()))
+        self.assertListEqual(
+            [93889, 22650],
+            nat_packets[0]
+        )
+
 
 class TestGold(TestCase):
     # not twice in a row:
@@ -103,3 +159,16 @@ class TestGold(TestCase):
             [93889, 17298],
             solve_gold()
         )
+
+    def test_assignement_time_sliced(self):
+        self.assertListEqual(
+            [93889, 17298],
+            solve_gold(quantum=50)
+        )
+
+    def test_assignement_async(self):
+        _, nat_delivered_packets = asyncio.run(run_network(num_computers=50, program=read_data()))
+        self.assertListEqual(
+            [93889, 17298],
+            nat_delivered_packets[-1]
+        )
@@ -1,33 +1,52 @@
+import hashlib
+import os
 import re
+from tempfile import TemporaryDirectory
 from typing import Set
 from unittest import TestCase
 
-from shared.intcode import Intcode, read_data
+from shared.intcode import Intcode, read_data, Tracer, replay, AsciiTerminal
 
 
 def execute_1_command(command, intcode):
-    intcode.input_ascii(command + '\n')
-    intcode.run_program()
-    response = intcode.output_ascii()
-    intcode.output = []
-    return response
+    return AsciiTerminal(intcode).command(command)
+
+
+GATHER_COMMANDS = [
+    'north', 'take wreath', 'east', 'east', 'east', 'take weather machine',
+    'west', 'west', 'west', 'south',
+    'south', 'south', 'take candy cane',
+    'north', 'west', 'take prime number', 'west', 'take astrolabe',
+    'east', 'east', 'north', 'east', 'take food ration',
+    'south', 'east', 'south', 'take hypercube',
+    'east', 'take space law space brochure',
+    'north', 'inv',
+]
 
 
 def gather_all_items(intcode):
-    commands = [
-        'north', 'take wreath', 'east', 'east', 'east', 'take weather machine',
-        'west', 'west', 'west', 'south',
-        'south', 'south', 'take candy cane',
-        'north', 'west', 'take prime number', 'west', 'take astrolabe',
-        'east', 'east', 'north', 'east', 'take food ration',
-        'south', 'east', 'south', 'take hypercube',
-        'east', 'take space law space brochure',
-        'north', 'inv',
-    ]
-    for command in commands:
+    for command in GATHER_COMMANDS:
         execute_1_command(command, intcode)
 
 
+# named after the program and the commands, so changing either of them gathers again
+def checkpoint_path(program) -> str:
+    key = hashlib.sha1(repr((program, GATHER_COMMANDS)).encode()).hexdigest()
+    return 'items.{}.checkpoint'.format(key[:12])
+
+
+def with_all_items() -> Intcode:
+    # replaying the commands is slow, so the result is kept on disk
+    program = read_data()
+    path = checkpoint_path(program)
+    if os.path.exists(path):
+        return Intcode.load(path)
+    intcode = Intcode(instructions=program, inputs=[])
+    gather_all_items(intcode)
+    intcode.save(path)
+    return intcode
+
+
 ITEMS = {
     'candy cane', 'wreath', 'hypercube', 'food ration',
     'weather machine', 'space law space brochure', 'prime number', 'astrolabe',
@@ -73,11 +92,63 @@ class Bag:
 
 
 class TestSilver(TestCase):
-    def test(self):
-        data = read_data()
-        intcode = Intcode(instructions=data, inputs=[])
+    def test_checkpoint(self):
+        intcode = Intcode(instructions=read_data(), inputs=[])
+        gather_all_items(intcode)
+        self.assertEqual(
+            execute_1_command('inv', with_all_items()),
+            execute_1_command('inv', intcode)
+        )
+
+    def test_save_load(self):
+        intcode = Intcode(instructions=read_data(), inputs=[])
+        gather_all_items(intcode)
+        intcode.input_ascii('inv\n')
+        intcode.output.extend([10, 62])
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'items.checkpoint')
+            intcode.save(path)
+            loaded = Intcode.load(path)
+        self.assertEqual(loaded.memory.pages.keys(), intcode.memory.pages.keys())
+        self.assertEqual(
+            (loaded.pointer, loaded.relative_base, loaded.input_required, loaded.halted, loaded.steps),
+            (intcode.pointer, intcode.relative_base, intcode.input_required, intcode.halted, intcode.steps)
+        )
+        self.assertEqual(
+            list(loaded.memory.read_range(0, 8192)),
+            list(intcode.memory.read_range(0, 8192))
+        )
+        self.assertEqual(list(loaded.inputs), list(intcode.inputs))
+        self.assertEqual(list(loaded.output), list(intcode.output))
+        self.assertEqual(
+            execute_1_command('north', loaded),
+            execute_1_command('north', intcode)
+        )
+
+    def test_trace_replay(self):
+        intcode = Intcode(instructions=read_data(), inputs=[])
+        checkpoint = intcode.snapshot()
+        intcode.tracer = Tracer(capacity=1 << 17)
+        gather_all_items(intcode)
+        replayed = replay(checkpoint, intcode.tracer.entries())
+        self.assertEqual(
+            list(replayed.memory.read_range(0, 5000)),
+            list(intcode.memory.read_range(0, 5000))
+        )
 
+    def test_trace_replay_wrapped(self):
+        intcode = Intcode(instructions=read_data(), inputs=[])
+        intcode.tracer = Tracer(capacity=1000)
         gather_all_items(intcode)
+        self.assertGreater(intcode.tracer.count, 100 * intcode.tracer.capacity)
+        replayed = intcode.tracer.replay()
+        self.assertEqual(
+            (replayed.pointer, replayed.relative_base, list(replayed.memory.read_range(0, 5000))),
+            (intcode.pointer, intcode.relative_base, list(intcode.memory.read_range(0, 5000)))
+        )
+
+    def test(self):
+        intcode = with_all_items()
 
         bags = {
             Bag.bag_with_all_but(item)
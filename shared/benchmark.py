@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+from itertools import permutations
+from time import perf_counter
+from typing import List, Dict, Callable, Optional
+
+from shared.intcode import Intcode, Profiler, read_data
+from shared.intcode_compiler import CompiledIntcode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, 'shared', 'benchmark_baseline.json')
+# timer noise on the short workloads is not a regression
+MIN_SLOWDOWN = 0.005
+
+vm_classes = {
+    'intcode': Intcode,
+    'compiled': CompiledIntcode,
+}
+
+
+def program(day: str) -> List[int]:
+    return read_data(os.path.join(ROOT, 'day' + day, 'data.txt'))
+
+
+def diagnostics(vm_class):
+    return [list(vm_class(program('05'), [system]).run_program()) for system in (1, 5)]
+
+
+def amplifiers(vm_class):
+    data = program('07')
+    best = 0
+    for phases in permutations(range(5)):
+        signal = 0
+        for phase in phases:
+            signal = vm_class(data, [phase, signal]).run_program()[0]
+        best = max(best, signal)
+    best_feedback = 0
+    for phases in permutations(range(5, 10)):
+        amplifiers = [vm_class(data, [phase]) for phase in phases]
+        signal = [0]
+        while not amplifiers[-1].halted:
+            for amplifier in amplifiers:
+                amplifier.add_input(signal)
+                amplifier.run_program()
+                signal = amplifier.output.drain()
+        best_feedback = max(best_feedback, signal[0])
+    return [best, best_feedback]
+
+
+def boost(vm_class):
+    return [list(vm_class(program('09'), [mode]).run_program()) for mode in (1, 2)]
+
+
+# day 13 without a screen: the paddle follows the ball until all blocks are gone
+def breakout(vm_class):
+    data = program('13')
+    data[0] = 2
+    intcode = vm_class(data, [])
+    score = ball = paddle = 0
+    while True:
+        intcode.run_program()
+        output = intcode.output.drain()
+        for x, y, tile in zip(output[::3], output[1::3], output[2::3]):
+            if x == -1:
+                score = tile
+            elif tile == 3:
+                paddle = x
+            elif tile == 4:
+                ball = x
+        if intcode.halted:
+            return score
+        intcode.add_input([(ball > paddle) - (ball < paddle)])
+
+
+def camera(vm_class):
+    return len(vm_class(program('17'), []).run_program())
+
+
+def tractor_beam(vm_class):
+    data = program('19')
+    return sum(
+        vm_class(data, [x, y]).run_program()[0]
+        for x in range(50)
+        for y in range(50)
+    )
+
+
+# day 23 until the first packet for the NAT
+def network(vm_class):
+    data = program('23')
+    computers = [vm_class(data, [address]) for address in range(50)]
+    queues = [[] for _ in computers]
+    while True:
+        for address, computer in enumerate(computers):
+            computer.add_input(queues[address] or [-1])
+            queues[address] = []
+            computer.run_program()
+            output = computer.output.drain()
+            for destination, x, y in zip(output[::3], output[1::3], output[2::3]):
+                if destination == 255:
+                    return y
+                queues[destination] += [x, y]
+
+
+def item_gathering(vm_class):
+    from day25.solution import gather_all_items, execute_1_command
+    intcode = vm_class(program('25'), [])
+    gather_all_items(intcode)
+    return execute_1_command('inv', intcode)
+
+
+workloads: Dict[str, Callable] = {
+    'day05 diagnostics': diagnostics,
+    'day07 amplifiers': amplifiers,
+    'day09 boost': boost,
+    'day13 breakout': breakout,
+    'day17 camera': camera,
+    'day19 tractor beam': tractor_beam,
+    'day23 network': network,
+    'day25 item gathering': item_gathering,
+}
+
+
+# the same workload on profiled VMs, they count every instruction they run
+def count_instructions(workload: Callable, vm_class) -> int:
+    class Counting(vm_class):
+        instances = []
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.profiler = Profiler()
+            Counting.instances.append(self)
+
+    workload(Counting)
+    return sum(
+        sum(intcode.profiler.opcodes.values())
+        for intcode in Counting.instances
+    )
+
+
+def measure(workload: Callable, vm_class, repeat: int) -> Dict[str, float]:
+    instructions = count_instructions(workload, vm_class)
+    wall_time = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        workload(vm_class)
+        wall_time = min(wall_time, perf_counter() - start)
+    tracemalloc.start()
+    try:
+        workload(vm_class)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'instructions': instructions,
+        'wall_time': wall_time,
+        'instructions_per_second': instructions / wall_time,
+        'peak_memory': peak_memory,
+    }
+
+
+def regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                tolerance: float) -> List[str]:
+    found = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for key in ('wall_time', 'peak_memory'):
+            if key == 'wall_time' and result[key] - reference[key] < MIN_SLOWDOWN:
+                continue
+            if result[key] > reference[key] * (1 + tolerance):
+                found.append('{}: {} went from {:.4g} to {:.4g}'.format(name, key, reference[key], result[key]))
+    return found
+
+
+def report(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]) -> str:
+    lines = ['{:22} {:>12} {:>10} {:>12} {:>10} {:>9}'.format(
+        'workload', 'instructions', 'wall (s)', 'instr/s', 'peak (KiB)', 'vs base'
+    )]
+    for name, result in results.items():
+        reference = baseline.get(name)
+        change = '' if reference is None else '{:+.1%}'.format(result['wall_time'] / reference['wall_time'] - 1)
+        lines.append('{:22} {:12} {:10.3f} {:12.0f} {:10.0f} {:>9}'.format(
+            name, result['instructions'], result['wall_time'], result['instructions_per_second'],
+            result['peak_memory'] / 1024, change
+        ))
+    return '\n'.join(lines)
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Intcode throughput over the puzzle programs')
+    parser.add_argument('workloads', nargs='*', help='names (or parts of names) of the workloads to run')
+    parser.add_argument('--vm', choices=sorted(vm_classes), default='intcode')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per workload, the best one counts')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed slowdown before it is a regression')
+    options = parser.parse_args(arguments)
+
+    selected = {
+        name: workload
+        for name, workload in workloads.items()
+        if not options.workloads or any(part in name for part in options.workloads)
+    }
+    baseline = {}
+    if os.path.exists(options.baseline):
+        with open(options.baseline) as file:
+            baseline = json.load(file).get(options.vm, {})
+
+    results = {
+        name: measure(workload, vm_classes[options.vm], options.repeat)
+        for name, workload in selected.items()
+    }
+    print(report(results, baseline))
+
+    if options.save:
+        stored = {}
+        if os.path.exists(options.baseline):
+            with open(options.baseline) as file:
+                stored = json.load(file)
+        stored[options.vm] = {**stored.get(options.vm, {}), **results}
+        with open(options.baseline, 'w') as file:
+            json.dump(stored, file, indent=2, sort_keys=True)
+        return 0
+
+    found = regressions(results, baseline, options.tolerance)
+    for regression in found:
+        print('regression: ' + regression)
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,138 +1,1347 @@
-from collections import defaultdict
+import json
+import mmap
+import os
+from array import array
+from collections import Counter, deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from copy import copy
-from typing import List
+from itertools import tee
+from operator import add, mul, lt, ge, eq, ne, truth, not_
+from time import perf_counter
+from typing import List, NamedTuple, Callable, Tuple, Optional, Iterable, Iterator, Sequence, Dict, Any, Union, Set
 
 
-def read_data() -> List[int]:
-    with open('data.txt') as file:
+def read_data(path: str = 'data.txt') -> List[int]:
+    return list(load_image(path))
+
+
+# parsed program images per (absolute path, modification time)
+images = {}
+SIDECAR_SUFFIX = '.intcode'
+
+
+def load_image(path: str = 'data.txt') -> Tuple[int, ...]:
+    path = os.path.abspath(path)
+    modified = os.stat(path).st_mtime_ns
+    image = images.get((path, modified))
+    if image is None:
+        image = read_sidecar(path, modified)
+        if image is None:
+            with open(path) as file:
+                image = tuple(
+                    int(code)
+                    for code in file.readline().split(',')
+                )
+            write_sidecar(path, modified, image)
+        images[(path, modified)] = image
+    return image
+
+
+# the sidecar holds the modification time of its source and the word count,
+# followed by the program, as int64
+SIDECAR_HEADER_LENGTH = 2
+
+
+def read_sidecar(path: str, modified: int) -> Optional[Tuple[int, ...]]:
+    try:
+        with open(path + SIDECAR_SUFFIX, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < 8 * SIDECAR_HEADER_LENGTH or size % 8 != 0:
+                return None
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view, view.cast('q') as words:
+                    if words[0] != modified or words[1] != len(words) - SIDECAR_HEADER_LENGTH:
+                        # stale or partially written
+                        return None
+                    return tuple(words[SIDECAR_HEADER_LENGTH:])
+    except OSError:
+        return None
+
+
+# written to a temporary file first, so readers never see half a sidecar
+def write_sidecar(path: str, modified: int, image: Tuple[int, ...]) -> None:
+    try:
+        words = array('q', (modified, len(image), *image))
+    except OverflowError:
+        return
+    temporary = '{}{}.{}.tmp'.format(path, SIDECAR_SUFFIX, os.getpid())
+    try:
+        with open(temporary, 'wb') as file:
+            words.tofile(file)
+        os.replace(temporary, path + SIDECAR_SUFFIX)
+    except OSError:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+
+
+# first word of a saved VM, 'INTCODE1' in little endian
+CHECKPOINT_MAGIC = int.from_bytes(b'INTCODE1', 'little')
+CHECKPOINT_HEADER_LENGTH = 9
+
+POSITION_MODE = 0
+IMMEDIATE_MODE = 1
+RELATIVE_MODE = 2
+
+# the longest instruction (opcode + 3 parameters), used to find the cached
+# instructions that cover a written address
+MAX_INSTRUCTION_LENGTH = 4
+# two fused instructions, the longest entry in the decode cache
+MAX_FUSED_LENGTH = 2 * MAX_INSTRUCTION_LENGTH
+# a conditional jump (opcode + 2 parameters), the end of a loop
+JUMP_LENGTH = 3
+# marks a written parameter in immediate mode
+SELF_WRITE_MODE = -1
+
+PAGE_BITS = 10
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+EMPTY_PAGE = bytes(8 * PAGE_SIZE)
+EMPTY_VALUES = (0,) * PAGE_SIZE
+
+
+def new_page(values=()):
+    page = array('q', EMPTY_PAGE)
+    try:
+        page[:len(values)] = array('q', values)
+    except OverflowError:
+        # values outside of 64 bit are kept in a plain list
+        page = list(page)
+        page[:len(values)] = values
+    return page
+
+
+class Memory:
+    def __init__(self, image=()):
+        self.pages = {
+            start >> PAGE_BITS: new_page(image[start:start + PAGE_SIZE])
+            for start in range(0, len(image), PAGE_SIZE)
+        }
+        # pages that are not shared with a fork and can be written in place
+        self.writable = dict(self.pages)
+
+    def fork(self) -> 'Memory':
+        clone = Memory()
+        clone.pages = dict(self.pages)
+        self.writable = {}
+        return clone
+
+    def __getitem__(self, address):
+        page = self.pages.get(address >> PAGE_BITS)
+        if page is None:
+            return 0
+        return page[address & PAGE_MASK]
+
+    def read_range(self, address, count):
+        page = self.pages.get(address >> PAGE_BITS)
+        offset = address & PAGE_MASK
+        if page is not None and offset + count <= PAGE_SIZE:
+            return page[offset:offset + count]
+        return [self[address + shift] for shift in range(count)]
+
+    def __setitem__(self, address, value):
+        page = self.writable.get(address >> PAGE_BITS)
+        if page is None:
+            page = self.copy_page(address)
+        try:
+            page[address & PAGE_MASK] = value
+        except OverflowError:
+            page = self.pages[address >> PAGE_BITS] = self.writable[address >> PAGE_BITS] = list(page)
+            page[address & PAGE_MASK] = value
+
+    def copy_page(self, address):
+        if address < 0:
+            raise Exception('negative address was written, address was: {}'.format(address))
+        shared = self.pages.get(address >> PAGE_BITS)
+        page = new_page() if shared is None else shared[:]
+        self.pages[address >> PAGE_BITS] = self.writable[address >> PAGE_BITS] = page
+        return page
+
+
+class Instruction(NamedTuple):
+    opcode: int
+    execute: Callable
+    operator: Optional[Callable]
+    parameters: Tuple[Tuple[int, int], ...]
+    length: int
+
+
+class Channel:
+    def __init__(self, values: Iterable[int] = (), capacity: Optional[int] = None):
+        self.queue = deque(values)
+        self.capacity = capacity
+
+    def push(self, value: int) -> None:
+        self.queue.append(value)
+
+    def extend(self, values: Iterable[int]) -> None:
+        self.queue.extend(values)
+
+    def pop(self) -> int:
+        return self.queue.popleft()
+
+    def full(self) -> bool:
+        return self.capacity is not None and len(self.queue) >= self.capacity
+
+    def drain(self, buffer: Optional[List[int]] = None) -> List[int]:
+        if buffer is None:
+            buffer = []
+        buffer.extend(self.queue)
+        self.queue.clear()
+        return buffer
+
+    def clear(self) -> None:
+        self.queue.clear()
+
+    def index(self, value: int) -> int:
+        return self.queue.index(value)
+
+    def __len__(self):
+        return len(self.queue)
+
+    def __iter__(self):
+        return iter(self.queue)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self.queue)[index]
+        return self.queue[index]
+
+    def __eq__(self, other):
+        if not isinstance(other, (Channel, list, tuple, deque)):
+            return NotImplemented
+        return list(self.queue) == list(other)
+
+    def __copy__(self):
+        return Channel(self.queue, self.capacity)
+
+    def __repr__(self):
+        return 'Channel({})'.format(list(self.queue))
+
+
+class Profiler:
+    def __init__(self):
+        self.opcodes = Counter()
+        self.pointers = Counter()
+        self.input_waits = 0
+        self.run_times = []
+
+    def run(self, intcode: 'Intcode', max_steps: Optional[int] = None) -> int:
+        start = perf_counter()
+        steps = 0
+        while steps != max_steps and not intcode.halted and not intcode.input_required and not intcode.output_blocked:
+            pointer = intcode.pointer
+            instruction = intcode.step_instruction()
+            # a blocked output did not run, unless it blocked after filling the channel
+            if not intcode.input_required and not (intcode.output_blocked and intcode.pointer == pointer):
+                self.opcodes[instruction.opcode] += 1
+                self.pointers[pointer] += 1
+                steps += 1
+        if intcode.input_required:
+            self.input_waits += 1
+        self.run_times.append(perf_counter() - start)
+        return steps
+
+    def report(self, top: int = 20) -> str:
+        lines = [
+            'run_program calls: {}, total time: {:.6f}s, input waits: {}, instructions: {}'.format(
+                len(self.run_times), sum(self.run_times), self.input_waits, sum(self.opcodes.values())
+            ),
+            '',
+            'opcode      count',
+        ]
+        lines += [
+            '{:6} {:10}'.format(opcode, count)
+            for opcode, count in self.opcodes.most_common()
+        ]
+        lines += ['', 'pointer      hits']
+        lines += [
+            '{:7} {:9}'.format(pointer, count)
+            for pointer, count in self.pointers.most_common(top)
+        ]
+        return '\n'.join(lines)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'opcodes': {str(opcode): count for opcode, count in self.opcodes.most_common()},
+            'pointers': {str(pointer): count for pointer, count in self.pointers.most_common()},
+            'input_waits': self.input_waits,
+            'run_times': self.run_times,
+        })
+
+
+# a function of the VM giving its next input, or an iterator of inputs
+InputProvider = Union[Callable[['Intcode'], Optional[int]], Iterable[int]]
+
+
+class TraceRecord(NamedTuple):
+    pointer: int
+    opcode: int
+    operand1: int
+    operand2: int
+    # the written value, the next pointer of a jump, the new relative base or the output
+    result: int
+
+
+TRACE_RECORD_LENGTH = len(TraceRecord._fields)
+
+
+# Keeps the last capacity executed instructions, with a path every record is
+# also appended to that file (as int64 words) each time the ring is full.
+# Every checkpoint_interval records the traced VM is forked, so the records
+# that are still in the ring can be replayed from the oldest fork among them.
+class Tracer:
+    def __init__(self, capacity: int = 1 << 16, path: Optional[str] = None,
+                 checkpoint_interval: Optional[int] = None):
+        self.capacity = capacity
+        self.records: List[Optional[Tuple[int, ...]]] = [None] * capacity
+        self.count = 0
+        self.flushed = 0
+        self.path = path
+        if path is not None:
+            open(path, 'wb').close()
+        # half the ring by default, so at least half of it can always be replayed
+        self.checkpoint_interval = checkpoint_interval or max(1, capacity // 2)
+        self.checkpoints: deque = deque()
+
+    def record(self, pointer: int, opcode: int, operand1: int, operand2: int, result: int) -> None:
+        self.records[self.count % self.capacity] = (pointer, opcode, operand1, operand2, result)
+        self.count += 1
+        if self.path is not None and self.count - self.flushed == self.capacity:
+            self.flush()
+
+    # called by the traced VM before it executes record number count
+    def checkpoint(self, intcode: 'Intcode') -> None:
+        if self.checkpoints and self.checkpoints[-1][0] == self.count:
+            return
+        self.checkpoints.append((self.count, intcode.fork()))
+        while self.checkpoints[0][0] < self.count - self.capacity:
+            self.checkpoints.popleft()
+
+    def entries(self, start: Optional[int] = None) -> List[TraceRecord]:
+        oldest = max(0, self.count - self.capacity)
+        if start is None or start < oldest:
+            start = oldest
         return [
-            int(code)
-            for code in file.readline().split(',')
+            TraceRecord(*self.records[index % self.capacity])
+            for index in range(start, self.count)
         ]
 
+    # the oldest checkpoint that is still covered by the ring and the records since
+    def replayable(self) -> Tuple['Intcode', List[TraceRecord]]:
+        oldest = max(0, self.count - self.capacity)
+        for index, checkpoint in self.checkpoints:
+            if index >= oldest:
+                return checkpoint, self.entries(index)
+        raise Exception('no checkpoint in the last {} records'.format(self.capacity))
+
+    def replay(self) -> 'Intcode':
+        return replay(*self.replayable())
+
+    def flush(self) -> None:
+        words = array('q')
+        try:
+            for index in range(self.flushed, self.count):
+                words.extend(self.records[index % self.capacity])
+        except OverflowError:
+            raise Exception('values outside of 64 bit can not be written to a trace')
+        with open(self.path, 'ab') as file:
+            words.tofile(file)
+        self.flushed = self.count
 
-opcodes = {
-    1: (lambda intcode: intcode.opcode_1_2(lambda a, b: a + b)),
-    2: (lambda intcode: intcode.opcode_1_2(lambda a, b: a * b)),
-    3: (lambda intcode: intcode.opcode_3()),
-    4: (lambda intcode: intcode.opcode_4()),
-    5: (lambda intcode: intcode.opcode_5_6(lambda a: a != 0)),
-    6: (lambda intcode: intcode.opcode_5_6(lambda a: a == 0)),
-    7: (lambda intcode: intcode.opcode_7_8(lambda a, b: a < b)),
-    8: (lambda intcode: intcode.opcode_7_8(lambda a, b: a == b)),
-    9: (lambda intcode: intcode.opcode_9()),
-    99: (lambda intcode: intcode.opcode_99()),
-}
+
+def read_trace(path: str) -> List[TraceRecord]:
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view, view.cast('q') as words:
+                values = words.tolist()
+    return [
+        TraceRecord(*values[start:start + TRACE_RECORD_LENGTH])
+        for start in range(0, len(values), TRACE_RECORD_LENGTH)
+    ]
 
 
 class Intcode:
-    def __init__(self, instructions, inputs: List[int] = [0]):
-        self.__instructions = copy(instructions)
-        self.__extra_instructions = defaultdict(lambda: 0)
-        self.__inputs = inputs
-        self.__input_pointer = 0
-        self.output = []
+    # run an add or compare and the jump on its result as one superinstruction,
+    # off by default as only a few pairs qualify and the gain is within noise
+    fusion = False
+    # jump over the iterations of counted loops without I/O, off by default as
+    # finding the loops costs more than it saves on programs that rewrite them
+    loop_acceleration = False
+
+    def __init__(self, instructions, inputs: Iterable[int] = (0,), output_capacity: Optional[int] = None,
+                 input_provider: Optional[InputProvider] = None):
+        self.memory = Memory(instructions)
+        # the program as loaded, restored by reset() for the cells written since
+        self.__pristine = self.memory.fork()
+        self.__dirty = set()
+        # a fork only tracks the cells it writes itself, the earlier ones are found by comparing pages
+        self.__dirty_before_fork = False
+        self.inputs = inputs if isinstance(inputs, Channel) else Channel(inputs)
+        self.output = Channel(capacity=output_capacity)
         self.__pointer = 0
+        self.__decoded = {}
+        self.__decoded_addresses = set()
+        self.__loops = {}
+        # the decode cache is shared with forks until one of them changes it
+        self.__decoded_shared = False
+        # the longest entry the decode cache can hold, fused ones are longer
+        self.__decoded_length = MAX_INSTRUCTION_LENGTH
         self.input_required = False
+        self.output_blocked = False
         self.halted = False
         self.relative_base = 0
+        self.profiler: Optional[Profiler] = None
+        self.tracer: Optional[Tracer] = None
+        self.input_provider = input_provider
+        # instructions executed by run()
+        self.steps = 0
+        # instructions run() still allows, loop acceleration stays within it
+        self.__budget = None
+        # instructions run by a handler beyond the ones it was dispatched for
+        self.__extra_steps = 0
+        # set by run_until_outputs, an output that fills the channel also blocks
+        self.__stop_when_full = False
 
     def run_program(self):
-        while not self.halted and not self.input_required:
-            opcode = self.opcode()
-            opcodes[opcode](self)
-            # print(self.__instructions, self.__pointer)
+        self.output_blocked = False
+        if self.profiler is not None:
+            self.profiler.run(self)
+            return self.result()
+        if self.tracer is not None:
+            self.run_traced()
+            return self.result()
+        while not self.halted and not self.input_required and not self.output_blocked:
+            instruction = self.__decoded.get(self.__pointer) or self.decode_fused(self.__pointer)
+            instruction.execute(self, instruction)
+        return self.result()
+
+    def run(self, max_steps: Optional[int] = None) -> int:
+        self.output_blocked = False
+        if self.inputs:
+            self.input_required = False
+        if self.tracer is not None:
+            steps = self.run_traced(max_steps)
+        elif self.profiler is not None:
+            steps = self.profiler.run(self, max_steps)
+        else:
+            steps = self.run_counted(max_steps)
+        self.steps += steps
+        return steps
+
+    # counts both instructions of a fused pair and the iterations of fast-forwarded loops
+    def run_counted(self, max_steps: Optional[int] = None) -> int:
+        steps = 0
+        try:
+            while not self.halted and not self.input_required and not self.output_blocked:
+                instruction = self.__decoded.get(self.__pointer) or self.decode_fused(self.__pointer)
+                count = 2 if instruction.execute in fused_handlers else 1
+                if max_steps is not None:
+                    remaining = max_steps - steps
+                    if remaining <= 0:
+                        break
+                    if remaining < count:
+                        instruction = instruction.parameters[0]
+                        count = 1
+                    self.__budget = remaining - count
+                self.__extra_steps = 0
+                instruction.execute(self, instruction)
+                if self.input_required or self.output_blocked:
+                    # the (last) instruction did not run
+                    count -= 1
+                steps += count + self.__extra_steps
+        finally:
+            self.__budget = None
+        return steps
+
+    # runs instruction by instruction (no fused pairs, no loop acceleration),
+    # recording each one in the tracer with the operands read to execute it
+    def run_traced(self, max_steps: Optional[int] = None) -> int:
+        tracer = self.tracer
+        record = tracer.record
+        read = self.read
+        interval = tracer.checkpoint_interval
+        steps = 0
+        while steps != max_steps and not self.halted and not self.input_required and not self.output_blocked:
+            if tracer.count % interval == 0:
+                tracer.checkpoint(self)
+            pointer = self.__pointer
+            instruction = self.__decoded.get(pointer) or self.decode_fused(pointer)
+            if instruction.execute in fused_handlers:
+                instruction = instruction.parameters[0]
+            opcode = instruction.opcode
+            parameters = instruction.parameters
+            operand2 = 0
+            if opcode == 1 or opcode == 2:
+                operand1, operand2 = read(parameters[0]), read(parameters[1])
+                result = instruction.operator(operand1, operand2)
+                self.set_instruction(self.address(parameters[2]), result)
+                self.__pointer = pointer + 4
+            elif opcode == 7 or opcode == 8:
+                operand1, operand2 = read(parameters[0]), read(parameters[1])
+                result = int(instruction.operator(operand1, operand2))
+                self.set_instruction(self.address(parameters[2]), result)
+                self.__pointer = pointer + 4
+            elif opcode == 5 or opcode == 6:
+                operand1, operand2 = read(parameters[0]), read(parameters[1])
+                result = self.__pointer = operand2 if instruction.operator(operand1) else pointer + 3
+            elif opcode == 3:
+                instruction.execute(self, instruction)
+                if self.input_required:
+                    break
+                operand1 = 0
+                result = self.memory[self.address(parameters[0])]
+            elif opcode == 4:
+                if self.output.full():
+                    self.output_blocked = True
+                    break
+                operand1 = result = read(parameters[0])
+                self.output.push(operand1)
+                self.__pointer = pointer + 2
+                if self.__stop_when_full and self.output.full():
+                    self.output_blocked = True
+            elif opcode == 9:
+                operand1 = read(parameters[0])
+                result = self.relative_base = self.relative_base + operand1
+                self.__pointer = pointer + 2
+            else:
+                self.halted = True
+                operand1 = result = 0
+            record(pointer, opcode, operand1, operand2, result)
+            steps += 1
+        return steps
+
+    def step(self):
+        instruction = self.__decoded.get(self.__pointer) or self.decode_fused(self.__pointer)
+        instruction.execute(self, instruction)
+
+    # executes only the instruction at the pointer, also when it is fused with the next one
+    def step_instruction(self) -> Instruction:
+        instruction = self.__decoded.get(self.__pointer) or self.decode_fused(self.__pointer)
+        if instruction.execute in fused_handlers:
+            instruction = instruction.parameters[0]
+        instruction.execute(self, instruction)
+        return instruction
+
+    def result(self):
         if len(self.output) == 0:
             return self.get_instruction(0)
         else:
             return self.output
 
-    def add_input(self, values: List[int]) -> None:
-        self.__inputs.extend(values)
+    # called by an input instruction when the queue is empty, None means there is no input yet
+    @property
+    def input_provider(self) -> Optional[Callable[['Intcode'], Optional[int]]]:
+        return self.__input_provider
+
+    @input_provider.setter
+    def input_provider(self, provider: Optional[InputProvider]) -> None:
+        self.__input_iterator = None
+        if provider is not None and not callable(provider):
+            self.__input_iterator = iter(provider)
+            provider = Intcode.next_iterated_input
+        self.__input_provider = provider
+        if provider is not None:
+            # a VM waiting for input asks the new provider when it runs again
+            self.input_required = False
+
+    def next_iterated_input(self) -> Optional[int]:
+        return next(self.__input_iterator, None)
+
+    @property
+    def pointer(self):
+        return self.__pointer
+
+    @pointer.setter
+    def pointer(self, value):
+        self.__pointer = value
+
+    def fork(self) -> 'Intcode':
+        clone = type(self).__new__(type(self))
+        clone.restore(self)
+        clone.profiler = self.profiler
+        # a fork starts without a trace, it would mix its instructions into the original one
+        clone.tracer = None
+        # a provider function is shared, an iterator is split so both read the inputs that remain
+        clone.__input_provider = self.__input_provider
+        clone.__input_iterator = None
+        if self.__input_iterator is not None:
+            self.__input_iterator, clone.__input_iterator = tee(self.__input_iterator)
+        return clone
+
+    def snapshot(self) -> 'Intcode':
+        return self.fork()
+
+    def restore(self, snapshot: 'Intcode') -> None:
+        self.memory = snapshot.memory.fork()
+        self.__pristine = snapshot.__pristine
+        self.__dirty = set()
+        self.__dirty_before_fork = snapshot.__dirty_before_fork or bool(snapshot.__dirty)
+        self.inputs = copy(snapshot.inputs)
+        self.output = copy(snapshot.output)
+        self.__pointer = snapshot.__pointer
+        self.__decoded = snapshot.__decoded
+        self.__decoded_addresses = snapshot.__decoded_addresses
+        self.__loops = snapshot.__loops
+        self.__decoded_shared = snapshot.__decoded_shared = True
+        self.__decoded_length = snapshot.__decoded_length
+        self.input_required = snapshot.input_required
+        self.output_blocked = snapshot.output_blocked
+        self.halted = snapshot.halted
+        self.relative_base = snapshot.relative_base
+        self.steps = snapshot.steps
+        self.__budget = None
+        self.__extra_steps = 0
+        self.__stop_when_full = False
+
+    def reset(self, memory_patches: Optional[Dict[int, int]] = None, inputs: Iterable[int] = ()) -> None:
+        if self.__dirty_before_fork:
+            self.__dirty |= self.changed_cells()
+            self.__dirty_before_fork = False
+        for address in self.__dirty:
+            if address in self.__decoded_addresses:
+                self.invalidate(address)
+            self.memory[address] = self.__pristine[address]
+        self.__dirty = set()
+        self.inputs = Channel(inputs)
+        self.output.clear()
+        self.__pointer = 0
+        self.input_required = False
+        self.output_blocked = False
+        self.halted = False
+        self.relative_base = 0
+        self.steps = 0
+        for address, value in (memory_patches or {}).items():
+            self.set_instruction(address, value)
+
+    # the cells that differ from the program as loaded, pages shared with it are skipped
+    def changed_cells(self) -> Set[int]:
+        changed = set()
+        pristine_pages = self.__pristine.pages
+        for index in self.memory.pages.keys() | pristine_pages.keys():
+            page = self.memory.pages.get(index)
+            pristine = pristine_pages.get(index)
+            if page is pristine:
+                continue
+            start = index << PAGE_BITS
+            changed.update(
+                start + offset
+                for offset, (value, original) in enumerate(zip(page or EMPTY_VALUES, pristine or EMPTY_VALUES))
+                if value != original
+            )
+        return changed
+
+    # memory pages, queues and registers as int64 words, see load() for the layout
+    def save(self, path: str) -> None:
+        pages = sorted(self.memory.pages.items())
+        inputs = list(self.inputs)
+        output = list(self.output)
+        flags = self.halted | self.input_required << 1 | self.output_blocked << 2
+        capacity = -1 if self.output.capacity is None else self.output.capacity
+        try:
+            words = array('q', (
+                CHECKPOINT_MAGIC, self.__pointer, self.relative_base, flags, capacity, self.steps,
+                len(pages), len(inputs), len(output),
+            ))
+            for index, page in pages:
+                words.append(index)
+                words.extend(page)
+            words.extend(inputs)
+            words.extend(output)
+        except OverflowError:
+            raise Exception('values outside of 64 bit can not be saved')
+        # a reader never sees a partly written file
+        temporary = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temporary, 'wb') as file:
+            words.tofile(file)
+        os.replace(temporary, path)
+
+    # the loaded state also becomes what reset() returns to
+    @classmethod
+    def load(cls, path: str) -> 'Intcode':
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < 8 * CHECKPOINT_HEADER_LENGTH or size % 8 != 0:
+                raise Exception('not a saved Intcode VM, file was: {}'.format(path))
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                    memoryview(mapped) as view, view.cast('q') as words:
+                magic, pointer, relative_base, flags, capacity, steps, page_count, input_count, output_count = \
+                    words[:CHECKPOINT_HEADER_LENGTH]
+                if magic != CHECKPOINT_MAGIC:
+                    raise Exception('not a saved Intcode VM, file was: {}'.format(path))
+                if len(words) != CHECKPOINT_HEADER_LENGTH + page_count * (1 + PAGE_SIZE) + input_count + output_count:
+                    raise Exception('saved Intcode VM is incomplete, file was: {}'.format(path))
+                memory = Memory()
+                position = CHECKPOINT_HEADER_LENGTH
+                for _ in range(page_count):
+                    memory.pages[words[position]] = array('q', words[position + 1:position + 1 + PAGE_SIZE].tobytes())
+                    position += 1 + PAGE_SIZE
+                memory.writable = dict(memory.pages)
+                inputs = words[position:position + input_count].tolist()
+                position += input_count
+                output = words[position:position + output_count].tolist()
+
+        intcode = cls((), inputs, None if capacity < 0 else capacity)
+        intcode.memory = memory
+        intcode.__pristine = memory.fork()
+        intcode.output.extend(output)
+        intcode.__pointer = pointer
+        intcode.relative_base = relative_base
+        intcode.halted = bool(flags & 1)
+        intcode.input_required = bool(flags & 2)
+        intcode.output_blocked = bool(flags & 4)
+        intcode.steps = steps
+        return intcode
+
+    def run_until_outputs(self, count: int) -> List[int]:
+        if len(self.output) < count:
+            capacity = self.output.capacity
+            self.output.capacity = count if capacity is None else min(count, capacity)
+            self.__stop_when_full = True
+            try:
+                self.run_program()
+            finally:
+                self.output.capacity = capacity
+                self.__stop_when_full = False
+        return [self.output.pop() for _ in range(min(count, len(self.output)))]
+
+    def outputs(self) -> Iterator[int]:
+        while True:
+            values = self.run_until_outputs(1)
+            if not values:
+                return
+            yield values[0]
+
+    def add_input(self, values: Iterable[int]) -> None:
+        self.inputs.extend(values)
         self.input_required = False
 
     def opcode(self):
         return self.get_instruction(self.__pointer) % 100
 
-    def get_parameter(self, shift):
-        location = self.location_memory_access(shift)
-        return self.get_instruction(location)
-
-    def location_memory_access(self, shift):
-        mode = int(self.get_instruction(self.__pointer) / (10 * 10 ** shift)) % 10
-        if mode == 1:
-            location = self.__pointer + shift
-        elif mode == 2:
-            location = self.get_instruction(self.__pointer + shift) + self.relative_base
-        elif mode == 0:
-            location = self.get_instruction(self.__pointer + shift)
-        else:
-            raise Exception('non existing mode was called, mode was: {}'.format(mode))
-        return location
+    def decode(self, position) -> Instruction:
+        instruction = self.decode_instruction(position)
+        if self.__decoded_shared:
+            self.own_decode_cache()
+        self.__decoded[position] = instruction
+        self.__decoded_addresses.update(range(position, position + instruction.length))
+        return instruction
+
+    def decode_instruction(self, position) -> Instruction:
+        words = self.memory.read_range(position, MAX_INSTRUCTION_LENGTH)
+        key = (position, tuple(words))
+        instruction = decoded_instructions.get(key)
+        if instruction is None:
+            if len(decoded_instructions) >= MAX_DECODED_INSTRUCTIONS:
+                decoded_instructions.clear()
+            instruction = decoded_instructions[key] = decode_words(position, words)
+        return instruction
+
+    def decode_fused(self, position) -> Instruction:
+        first = self.decode(position)
+        if not self.fusion or first.opcode not in (1, 7, 8):
+            return first
+        mode, target = first.parameters[2]
+        if mode != POSITION_MODE or position <= target < position + MAX_FUSED_LENGTH:
+            # the jump might be rewritten by the result, it is run on its own
+            return first
+        try:
+            second = self.decode(position + first.length)
+        except Exception:
+            # data follows, nothing to fuse with
+            return first
+        if second.opcode not in (5, 6) or second.parameters[0] != first.parameters[2]:
+            return first
+        instruction = Instruction(
+            first.opcode, Intcode.opcode_branch_fused, None, (first, second), first.length + second.length
+        )
+        self.__decoded[position] = instruction
+        self.__decoded_length = MAX_FUSED_LENGTH
+        return instruction
+
+    def own_decode_cache(self) -> None:
+        self.__decoded = dict(self.__decoded)
+        self.__decoded_addresses = set(self.__decoded_addresses)
+        self.__loops = dict(self.__loops)
+        self.__decoded_shared = False
+
+    def invalidate(self, position):
+        if self.__decoded_shared:
+            self.own_decode_cache()
+        if self.__loops:
+            # only the loops whose code was written have to be found again
+            for head, jump_pointer in list(self.__loops):
+                if head <= position < jump_pointer + JUMP_LENGTH:
+                    del self.__loops[head, jump_pointer]
+        decoded = self.__decoded
+        for start in range(position - self.__decoded_length + 1, position + 1):
+            instruction = decoded.get(start)
+            if instruction is not None and start + instruction.length > position:
+                del decoded[start]
+
+    def read(self, parameter):
+        mode, value = parameter
+        if mode == IMMEDIATE_MODE:
+            return value
+        if mode == RELATIVE_MODE:
+            value += self.relative_base
+        return self.memory[value]
+
+    def address(self, parameter):
+        mode, value = parameter
+        if mode == RELATIVE_MODE:
+            return value + self.relative_base
+        return value
 
     def get_instruction(self, position):
-        if position >= len(self.__instructions):
-            return self.__extra_instructions[position]
-        return self.__instructions[position]
+        return self.memory[position]
 
     def set_instruction(self, position, value):
-        if position >= len(self.__instructions):
-            self.__extra_instructions[position] = value
-        else:
-            self.__instructions[position] = value
-
-    def opcode_1_2(self, combinator):
-        input1 = self.get_parameter(1)
-        input2 = self.get_parameter(2)
-        result = combinator(input1, input2)
-        output = self.location_memory_access(3)
-        self.set_instruction(output, result)
+        if position in self.__decoded_addresses:
+            self.invalidate(position)
+        self.__dirty.add(position)
+        self.memory[position] = value
+
+    def opcode_1_2(self, instruction):
+        input1, input2, output = instruction.parameters
+        self.set_instruction(self.address(output), instruction.operator(self.read(input1), self.read(input2)))
         self.__pointer += 4
 
-    def opcode_3(self):
-        if self.__input_pointer >= len(self.__inputs):
-            self.input_required = True
-            return
-        location = self.location_memory_access(1)
-        self.set_instruction(location,  self.__inputs[self.__input_pointer])
-        self.__input_pointer += 1
+    def opcode_3(self, instruction):
+        if self.inputs:
+            value = self.inputs.pop()
+        else:
+            value = None if self.__input_provider is None else self.__input_provider(self)
+            if value is None:
+                self.input_required = True
+                return
+        self.set_instruction(self.address(instruction.parameters[0]), value)
         self.__pointer += 2
 
-    def opcode_4(self):
-        self.output.append(self.get_parameter(1))
+    def opcode_4(self, instruction):
+        if self.output.full():
+            self.output_blocked = True
+            return
+        self.output.push(self.read(instruction.parameters[0]))
         self.__pointer += 2
+        if self.__stop_when_full and self.output.full():
+            self.output_blocked = True
 
-    def opcode_5_6(self, evaluator):
-        input1 = self.get_parameter(1)
-        if evaluator(input1):
-            self.__pointer = self.get_parameter(2)
+    def opcode_5_6(self, instruction):
+        input1, input2 = instruction.parameters
+        if instruction.operator(self.read(input1)):
+            target = self.read(input2)
+            if target < self.__pointer and self.loop_acceleration and self.accelerate_loop(target, self.__pointer):
+                return
+            self.__pointer = target
         else:
             self.__pointer += 3
 
-    def opcode_7_8(self, comparator):
-        input1 = self.get_parameter(1)
-        input2 = self.get_parameter(2)
-        output = self.location_memory_access(3)
-        if comparator(input1, input2):
-            self.set_instruction(output, 1)
+    def opcode_7_8(self, instruction):
+        input1, input2, output = instruction.parameters
+        if instruction.operator(self.read(input1), self.read(input2)):
+            self.set_instruction(self.address(output), 1)
         else:
-            self.set_instruction(output, 0)
+            self.set_instruction(self.address(output), 0)
         self.__pointer += 4
 
-    def opcode_9(self):
-        parameter = self.get_parameter(1)
-        self.relative_base += parameter
+    def opcode_9(self, instruction):
+        self.relative_base += self.read(instruction.parameters[0])
         self.__pointer += 2
 
-    def opcode_99(self):
+    def opcode_99(self, instruction):
         self.halted = True
 
+    # add or compare into a fixed cell followed by a conditional jump on it
+    def opcode_branch_fused(self, instruction):
+        first, second = instruction.parameters
+        input1, input2, output = first.parameters
+        value = int(first.operator(self.read(input1), self.read(input2)))
+        self.set_instruction(output[1], value)
+        if second.operator(value):
+            target = self.read(second.parameters[1])
+            jump_pointer = self.__pointer + first.length
+            if target < jump_pointer and self.loop_acceleration and self.accelerate_loop(target, jump_pointer):
+                return
+            self.__pointer = target
+        else:
+            self.__pointer += instruction.length
+
+    # called when a backward jump is taken, runs the remaining iterations of the
+    # loop at once if it only counts cells up or down until a comparison fails
+    def accelerate_loop(self, head, jump_pointer) -> bool:
+        if self.profiler is not None or self.tracer is not None:
+            # they have to see every iteration
+            return False
+        key = (head, jump_pointer)
+        if key not in self.__loops:
+            if self.__decoded_shared:
+                self.own_decode_cache()
+            self.__loops[key] = self.find_counted_loop(head, jump_pointer)
+        loop = self.__loops[key]
+        if loop is None:
+            return False
+        if self.__budget is not None and self.__budget < len(loop.body) + 1:
+            return False
+        if not self.fast_forward(loop):
+            # depends on the values (aliasing cells, endless loop), stop trying
+            if self.__decoded_shared:
+                self.own_decode_cache()
+            self.__loops[key] = None
+            return False
+        return True
+
+    def find_counted_loop(self, head, jump_pointer) -> Optional['CountedLoop']:
+        body = []
+        pointer = head
+        try:
+            while pointer < jump_pointer:
+                instruction = self.decode_instruction(pointer)
+                if instruction.opcode not in (1, 7, 8):
+                    return None
+                body.append(instruction)
+                pointer += instruction.length
+            jump = self.decode_instruction(jump_pointer)
+        except Exception:
+            return None
+        if pointer != jump_pointer or jump.parameters[1] != (IMMEDIATE_MODE, head):
+            return None
+        if any(instruction.opcode != 1 for instruction in body[:-1]):
+            return None
+        return CountedLoop(head, tuple(body), jump, jump_pointer + jump.length)
+
+    def fast_forward(self, loop: 'CountedLoop') -> bool:
+        body = list(loop.body)
+        compare = body.pop() if body and body[-1].opcode in (7, 8) else None
+        # every add has to be a cell += loop invariant step
+        steps = {}
+        for instruction in body:
+            input1, input2, output = instruction.parameters
+            target = self.address(output)
+            if target in steps:
+                return False
+            if input1[0] != IMMEDIATE_MODE and self.address(input1) == target:
+                steps[target] = input2
+            elif input2[0] != IMMEDIATE_MODE and self.address(input2) == target:
+                steps[target] = input1
+            else:
+                return False
+        flag = None if compare is None else self.address(compare.parameters[2])
+        written = set(steps)
+        if flag is not None:
+            if flag in steps:
+                return False
+            written.add(flag)
+        if any(loop.head <= address < loop.exit for address in written):
+            return False
+        if any(step[0] != IMMEDIATE_MODE and self.address(step) in written for step in steps.values()):
+            return False
+        steps = {target: self.read(step) for target, step in steps.items()}
+
+        # the exit condition as a function of the remaining iterations k: base + k * slope
+        condition = loop.jump.parameters[0]
+        if condition[0] == IMMEDIATE_MODE:
+            return False
+        if compare is None:
+            address = self.address(condition)
+            if address not in steps:
+                return False
+            base, slope = self.memory[address], steps[address]
+            holds = ne
+        else:
+            if self.address(condition) != flag:
+                return False
+            values = []
+            for parameter in compare.parameters[:2]:
+                if parameter[0] == IMMEDIATE_MODE:
+                    values.append((parameter[1], 0))
+                    continue
+                address = self.address(parameter)
+                if address == flag:
+                    return False
+                values.append((self.memory[address], steps.get(address, 0)))
+            (base1, slope1), (base2, slope2) = values
+            base, slope = base1 - base2, slope1 - slope2
+            holds = lt if compare.opcode == 7 else eq
+        continues = holds if loop.jump.opcode == 5 else negated[holds]
+        iterations = first_iteration(base, slope, negated[continues])
+        if iterations is None:
+            return False
+        pointer = loop.exit
+        if self.__budget is not None and iterations * (len(loop.body) + 1) > self.__budget:
+            # as many iterations as run() allows, ending on the jump back
+            iterations = self.__budget // (len(loop.body) + 1)
+            pointer = loop.head
+
+        for target, step in steps.items():
+            self.set_instruction(target, self.memory[target] + iterations * step)
+        if flag is not None:
+            self.set_instruction(flag, int(holds(base + iterations * slope, 0)))
+        self.__pointer = pointer
+        self.__extra_steps = iterations * (len(loop.body) + 1)
+        return True
+
     def output_ascii(self) -> str:
-        return ''.join([
-            chr(code)
+        return bytes(
+            code
             for code in self.output
-            if code < 127
-        ])
+            if 0 <= code < 127
+        ).decode('ascii')
 
     def input_ascii(self, value: str) -> None:
-        self.add_input([ord(char) for char in value])
+        self.add_input(value.encode('ascii'))
+
+
+fused_handlers = {Intcode.opcode_branch_fused}
+
+opcodes = {
+    # opcode: (execute, operator, parameter count, last parameter is written)
+    1: (Intcode.opcode_1_2, add, 3, True),
+    2: (Intcode.opcode_1_2, mul, 3, True),
+    3: (Intcode.opcode_3, None, 1, True),
+    4: (Intcode.opcode_4, None, 1, False),
+    5: (Intcode.opcode_5_6, truth, 2, False),
+    6: (Intcode.opcode_5_6, not_, 2, False),
+    7: (Intcode.opcode_7_8, lt, 3, True),
+    8: (Intcode.opcode_7_8, eq, 3, True),
+    9: (Intcode.opcode_9, None, 1, False),
+    99: (Intcode.opcode_99, None, 0, False),
+}
+
+# straight-line adds and at most one compare at head, ending in a conditional jump back to head
+class CountedLoop(NamedTuple):
+    head: int
+    body: Tuple[Instruction, ...]
+    jump: Instruction
+    exit: int
+
+
+negated = {lt: ge, ge: lt, eq: ne, ne: eq}
+
+
+# smallest k >= 1 for which condition(base + k * slope, 0) holds, None if there is none
+def first_iteration(base: int, slope: int, condition) -> Optional[int]:
+    if condition(base + slope, 0):
+        return 1
+    if condition == ne:
+        return 2 if slope != 0 else None
+    if condition == eq:
+        if slope == 0 or -base % slope != 0:
+            return None
+        iterations = -base // slope
+        return iterations if iterations > 1 else None
+    if condition == lt:
+        return base // -slope + 1 if slope < 0 else None
+    return -(base // slope) if slope > 0 else None
+
+
+# decoded opcode and parameter modes per instruction value, shared by all programs
+templates = {}
+
+
+def decode_template(value):
+    modes, opcode = divmod(value, 100)
+    if opcode not in opcodes:
+        raise Exception('non existing opcode was called, opcode was: {}'.format(opcode))
+    execute, operator, parameter_count, writes = opcodes[opcode]
+    parameter_modes = []
+    for shift in range(1, parameter_count + 1):
+        modes, mode = divmod(modes, 10)
+        if mode not in (POSITION_MODE, IMMEDIATE_MODE, RELATIVE_MODE):
+            raise Exception('non existing mode was called, mode was: {}'.format(mode))
+        if mode == IMMEDIATE_MODE and writes and shift == parameter_count:
+            mode = SELF_WRITE_MODE
+        parameter_modes.append(mode)
+    template = (opcode, execute, operator, tuple(parameter_modes))
+    templates[value] = template
+    return template
+
+
+# decoded instructions per (position, words at it), shared by all VMs, so a
+# fresh VM of a program that ran before does not decode it again
+decoded_instructions = {}
+MAX_DECODED_INSTRUCTIONS = 1 << 16
+
+
+def decode_words(position, words) -> Instruction:
+    opcode, execute, operator, modes = templates.get(words[0]) or decode_template(words[0])
+    parameters = []
+    shift = 0
+    for mode in modes:
+        shift += 1
+        if mode == SELF_WRITE_MODE:
+            # writing in immediate mode overwrites the parameter itself
+            parameters.append((POSITION_MODE, position + shift))
+        else:
+            parameters.append((mode, words[shift]))
+    return Instruction(opcode, execute, operator, tuple(parameters), shift + 1)
+
+
+# Runs the traced instructions again from the state they started at, taking the
+# inputs from the trace and keeping the outputs, and checks every record matches.
+def replay(checkpoint: Intcode, records: Sequence[TraceRecord]) -> Intcode:
+    intcode = checkpoint.fork()
+    intcode.profiler = None
+    intcode.tracer = Tracer(capacity=max(1, len(records)))
+    intcode.input_provider = None
+    intcode.inputs = Channel(record.result for record in records if record.opcode == 3)
+    intcode.output = Channel()
+    intcode.input_required = False
+    intcode.output_blocked = False
+    intcode.run_traced(len(records))
+    for step, (expected, actual) in enumerate(zip(records, intcode.tracer.entries())):
+        if tuple(expected) != tuple(actual):
+            raise Exception('replay diverged at step {}: expected {}, got {}'.format(step, expected, actual))
+    if intcode.tracer.count != len(records):
+        raise Exception('replay stopped after {} of {} steps'.format(intcode.tracer.count, len(records)))
+    return intcode
+
+
+class VMPool:
+    def __init__(self, program: List[int]):
+        self.program = program
+        self.available: List[Intcode] = []
+
+    def acquire(self, inputs: Iterable[int] = (), memory_patches: Optional[Dict[int, int]] = None) -> Intcode:
+        if self.available:
+            intcode = self.available.pop()
+            intcode.reset(memory_patches, inputs)
+        else:
+            intcode = Intcode(self.program, inputs)
+            for address, value in (memory_patches or {}).items():
+                intcode.set_instruction(address, value)
+        return intcode
+
+    def release(self, intcode: Intcode) -> None:
+        self.available.append(intcode)
+
+
+# Decodes the output of an ASCII program as it arrives: only new output is
+# consumed, text comes out per complete line and the unfinished last line is
+# the prompt. Values outside of ASCII (scores, answers) are kept apart.
+class AsciiTerminal:
+    def __init__(self, intcode: Intcode):
+        self.intcode = intcode
+        self.partial = ''
+        self.values: List[int] = []
+
+    def decode(self) -> List[str]:
+        codes = self.intcode.output.drain()
+        if codes and not 0 <= min(codes) <= max(codes) < 127:
+            self.values.extend(code for code in codes if not 0 <= code < 127)
+            codes = [code for code in codes if 0 <= code < 127]
+        *lines, self.partial = (self.partial + bytes(codes).decode('ascii')).split('\n')
+        return lines
+
+    def prompt(self) -> str:
+        return self.partial
+
+    # streams the lines while the program runs, then the prompt it waits on (if any)
+    def lines(self) -> Iterator[str]:
+        for code in self.intcode.outputs():
+            if not 0 <= code < 127:
+                self.values.append(code)
+            elif code == 10:
+                line, self.partial = self.partial, ''
+                yield line
+            else:
+                self.partial += chr(code)
+        if self.partial:
+            prompt, self.partial = self.partial, ''
+            yield prompt
+
+    def send(self, text: str) -> None:
+        self.intcode.input_ascii(text)
+
+    # sends one command line and returns everything the program answers, up to its next prompt
+    def command(self, text: str) -> str:
+        self.send(text + '\n')
+        self.intcode.run_program()
+        lines = self.decode()
+        return ''.join(line + '\n' for line in lines) + self.prompt()
+
+
+# Chains VMs by making the output channel of every stage the input channel of
+# the next one, with feedback the last stage feeds the first one again.
+# Only the output of the last stage (without feedback) can have a capacity.
+class Pipeline:
+    def __init__(self, stages: List[Intcode], feedback: bool = False):
+        self.stages = stages
+        self.feedback = feedback
+        destinations = list(zip(stages, stages[1:]))
+        if feedback:
+            destinations.append((stages[-1], stages[0]))
+        for source, destination in destinations:
+            if source.output.capacity is not None:
+                raise Exception('the output of a stage is replaced by the next input, capacity was: {}'.format(
+                    source.output.capacity
+                ))
+        for source, destination in destinations:
+            source.output = destination.inputs
+
+    @property
+    def output(self) -> Channel:
+        return self.stages[-1].output
+
+    def push(self, values: Iterable[int]) -> None:
+        self.stages[0].inputs.extend(values)
+
+    def halted(self) -> bool:
+        return all(stage.halted for stage in self.stages)
+
+    # runs the stages that have input until none of them can continue
+    def run(self) -> Channel:
+        progress = True
+        while progress:
+            progress = False
+            for stage in self.stages:
+                if not is_runnable(stage):
+                    continue
+                stage.input_required = False
+                stage.run_program()
+                progress = True
+        return self.output
+
+
+# Time-slices VMs by instruction budget: every round each runnable VM gets
+# quantum * priority steps, higher priorities first.
+class Scheduler:
+    def __init__(self, quantum: int = 1000):
+        self.quantum = quantum
+        self.vms: List[Tuple[Intcode, int]] = []
+        self.rounds = 0
+
+    def add(self, intcode: Intcode, priority: int = 1) -> None:
+        if priority < 1:
+            raise Exception('priority has to be at least 1, priority was: {}'.format(priority))
+        self.vms.append((intcode, priority))
+        self.vms.sort(key=lambda vm: -vm[1])
+
+    def remove(self, intcode: Intcode) -> None:
+        self.vms = [vm for vm in self.vms if vm[0] is not intcode]
+
+    def runnable(self) -> List[Intcode]:
+        return [intcode for intcode, _ in self.vms if is_runnable(intcode)]
+
+    def run_round(self) -> int:
+        steps = 0
+        for intcode, priority in self.vms:
+            if is_runnable(intcode):
+                steps += intcode.run(self.quantum * priority)
+        self.rounds += 1
+        return steps
+
+    def run(self, max_steps: Optional[int] = None) -> int:
+        steps = 0
+        while self.runnable() and (max_steps is None or steps < max_steps):
+            steps += self.run_round()
+        return steps
+
+
+def is_runnable(intcode: Intcode) -> bool:
+    if intcode.halted or intcode.output.full():
+        return False
+    return not intcode.input_required or bool(intcode.inputs)
+
+
+# program image of a batch worker process, shipped once by the pool initializer
+worker_program = None
+
+
+def initialize_worker(program: List[int]) -> None:
+    global worker_program
+    worker_program = program
+
+
+def run_once(program: Sequence[int], inputs: Sequence[int] = (), patches: Optional[Dict[int, int]] = None) -> Intcode:
+    intcode = Intcode(program, inputs)
+    for address, value in (patches or {}).items():
+        intcode.set_instruction(address, value)
+    intcode.run_program()
+    return intcode
+
+
+def plain_result(intcode: Intcode) -> Any:
+    result = intcode.result()
+    return list(result) if isinstance(result, Channel) else result
+
+
+def run_job(job: Tuple[Sequence[int], Dict[int, int]]) -> Any:
+    inputs, patches = job
+    return plain_result(run_once(worker_program, inputs, patches))
+
+
+def run_chunk(jobs: List[Tuple[Sequence[int], Dict[int, int]]]) -> List[Any]:
+    return [run_job(job) for job in jobs]
+
+
+def batch_jobs(inputs: Optional[Sequence[Sequence[int]]], patches: Optional[Sequence[Dict[int, int]]]):
+    if inputs is None:
+        inputs = [()] * len(patches)
+    if patches is None:
+        patches = [{}] * len(inputs)
+    if len(inputs) != len(patches):
+        raise Exception('inputs and patches differ in length: {} != {}'.format(len(inputs), len(patches)))
+    return list(zip(inputs, patches))
+
+
+def run_batch(program: List[int], inputs: Optional[Sequence[Sequence[int]]] = None,
+              patches: Optional[Sequence[Dict[int, int]]] = None, workers: Optional[int] = None,
+              chunksize: int = 64) -> List[Any]:
+    jobs = batch_jobs(inputs, patches)
+    with ProcessPoolExecutor(workers, initializer=initialize_worker, initargs=(program,)) as executor:
+        return list(executor.map(run_job, jobs, chunksize=chunksize))
+
+
+def find_first(program: List[int], predicate: Callable[[Any], bool], inputs: Optional[Sequence[Sequence[int]]] = None,
+               patches: Optional[Sequence[Dict[int, int]]] = None, workers: Optional[int] = None,
+               chunksize: int = 64) -> Optional[Tuple[int, Any]]:
+    jobs = batch_jobs(inputs, patches)
+    executor = ProcessPoolExecutor(workers, initializer=initialize_worker, initargs=(program,))
+    try:
+        futures = [
+            executor.submit(run_chunk, jobs[start:start + chunksize])
+            for start in range(0, len(jobs), chunksize)
+        ]
+        for chunk, future in enumerate(futures):
+            for offset, result in enumerate(future.result()):
+                if predicate(result):
+                    return chunk * chunksize + offset, result
+        return None
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+# Results of deterministic runs of one program, keyed by the memory patches
+# and the inputs, with the least recently used results evicted first.
+class RunCache:
+    def __init__(self, program: Sequence[int], capacity: int = 4096):
+        self.program = tuple(program)
+        self.capacity = capacity
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def run(self, inputs: Sequence[int] = (), patches: Optional[Dict[int, int]] = None) -> Any:
+        key = (tuple(sorted((patches or {}).items())), tuple(inputs))
+        if key in self.results:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return plain_value(self.results[key])
+        self.misses += 1
+        intcode = run_once(self.program, inputs, patches)
+        result = plain_result(intcode)
+        # only runs that are done with their input are reproducible from the key
+        if intcode.halted:
+            # kept as a tuple, callers get their own list
+            self.results[key] = tuple(result) if isinstance(result, list) else result
+            if len(self.results) > self.capacity:
+                self.results.popitem(last=False)
+        return result
+
+
+def plain_value(value: Any) -> Any:
+    return list(value) if isinstance(value, tuple) else value
@@ -0,0 +1,255 @@
+import sys
+from typing import List, Dict, Set, Tuple, NamedTuple, Optional, Iterable
+
+from shared.intcode import Intcode, Instruction, POSITION_MODE, IMMEDIATE_MODE, RELATIVE_MODE, read_data
+
+mnemonics = {
+    1: 'add',
+    2: 'mul',
+    3: 'in',
+    4: 'out',
+    5: 'jnz',
+    6: 'jz',
+    7: 'lt',
+    8: 'eq',
+    9: 'arb',
+    99: 'halt',
+}
+
+
+class Block(NamedTuple):
+    start: int
+    end: int
+    instructions: Tuple[Tuple[int, Instruction], ...]
+    successors: Tuple[int, ...]
+    # ends in a jump to a computed address (a return or a function pointer)
+    indirect: bool
+
+
+# Static view of a program image: the code reachable from address 0 (and from
+# the return addresses that calls store), split into basic blocks. Targets of
+# computed jumps are not known, so code only reached through them is unknown.
+# Only cells that the code reads or writes at a fixed address count as data.
+class Analysis:
+    def __init__(self, program: List[int]):
+        self.program = program
+        decoder = Intcode(program, ())
+        self.instructions: Dict[int, Instruction] = {}
+        self.entries: Set[int] = {0}
+        self.return_addresses: Set[int] = set()
+        # addresses the code runs into that do not hold an instruction (yet)
+        self.unresolved: Set[int] = set()
+        pending = [0]
+        while pending:
+            self.trace(decoder, pending.pop(), pending)
+
+        self.blocks: Dict[int, Block] = self.split_blocks()
+        self.frames: Dict[int, int] = self.find_frames()
+        self.written: Set[int] = set()
+        self.accessed: Set[int] = set()
+        self.relative_writes = False
+        for pointer, instruction in self.instructions.items():
+            for mode, value in instruction.parameters:
+                if mode == POSITION_MODE:
+                    self.accessed.add(value)
+            if instruction.opcode not in (1, 2, 3, 7, 8):
+                continue
+            mode, value = instruction.parameters[-1]
+            if mode == RELATIVE_MODE:
+                self.relative_writes = True
+            else:
+                self.written.add(value)
+        # an undecodable address on the path that the program writes is code it patches before running it
+        self.self_modifying: Set[int] = {
+            address
+            for address in self.written
+            if self.code_at(address) is not None or address in self.unresolved
+        }
+        self.code: Set[int] = {
+            address
+            for pointer, instruction in self.instructions.items()
+            for address in range(pointer, min(pointer + instruction.length, len(program)))
+        } | (self.unresolved & self.written)
+        self.data: List[Tuple[int, int]] = regions(
+            address
+            for address in self.accessed
+            if address < len(program) and address not in self.code
+        )
+        self.unknown: List[Tuple[int, int]] = regions(
+            address
+            for address in range(len(program))
+            if address not in self.code and address not in self.accessed
+        )
+        self.loops: List[Tuple[int, int]] = [
+            (successor, block.start)
+            for block in self.blocks.values()
+            for successor in block.successors
+            if successor <= block.start
+        ]
+
+    def trace(self, decoder: Intcode, pointer: int, pending: List[int]) -> None:
+        while pointer not in self.instructions and 0 <= pointer < len(self.program):
+            try:
+                instruction = decoder.decode_instruction(pointer)
+            except Exception:
+                # either the path is never taken or the program writes the instruction first
+                self.unresolved.add(pointer)
+                return
+            self.instructions[pointer] = instruction
+            following = pointer + instruction.length
+            opcode = instruction.opcode
+            if opcode in (1, 2) and instruction.parameters[2][0] == RELATIVE_MODE:
+                # a call stores its return address in the frame of the callee
+                value = constant(instruction)
+                if value is not None and value not in self.return_addresses and jumps_to(decoder, following, value):
+                    self.return_addresses.add(value)
+                    self.entries.add(value)
+                    pending.append(value)
+            if opcode in (5, 6):
+                mode, target = instruction.parameters[1]
+                condition_mode, condition = instruction.parameters[0]
+                if mode == IMMEDIATE_MODE:
+                    self.entries.add(target)
+                    pending.append(target)
+                if condition_mode == IMMEDIATE_MODE and bool(condition) == (opcode == 5):
+                    # unconditional jump
+                    return
+                self.entries.add(following)
+            if opcode == 99:
+                return
+            pointer = following
+
+    def split_blocks(self) -> Dict[int, Block]:
+        blocks = {}
+        for start in sorted(self.entries & set(self.instructions)):
+            instructions = []
+            pointer = start
+            successors = []
+            indirect = False
+            while True:
+                instruction = self.instructions[pointer]
+                instructions.append((pointer, instruction))
+                following = pointer + instruction.length
+                if instruction.opcode in (5, 6):
+                    mode, target = instruction.parameters[1]
+                    if mode == IMMEDIATE_MODE:
+                        successors.append(target)
+                    else:
+                        indirect = True
+                    condition_mode, condition = instruction.parameters[0]
+                    if condition_mode != IMMEDIATE_MODE or bool(condition) != (instruction.opcode == 5):
+                        successors.append(following)
+                    break
+                if instruction.opcode == 99:
+                    break
+                if following in self.entries or following not in self.instructions:
+                    if following in self.instructions:
+                        successors.append(following)
+                    break
+                pointer = following
+            blocks[start] = Block(start, following, tuple(instructions), tuple(successors), indirect)
+        return blocks
+
+    # functions open a frame by moving the relative base up as their first instruction
+    def find_frames(self) -> Dict[int, int]:
+        frames = {}
+        for start, block in self.blocks.items():
+            _, instruction = block.instructions[0]
+            mode, size = instruction.parameters[0] if instruction.parameters else (None, 0)
+            if instruction.opcode == 9 and mode == IMMEDIATE_MODE and size > 0:
+                frames[start] = size
+        return frames
+
+    def code_at(self, address: int) -> Optional[int]:
+        for start in range(max(0, address - 3), address + 1):
+            instruction = self.instructions.get(start)
+            if instruction is not None and start + instruction.length > address:
+                return start
+        return None
+
+    def disassemble(self) -> str:
+        lines = []
+        spans = {start: (end, '.data') for start, end in self.data}
+        spans.update((start, (end, '.unknown')) for start, end in self.unknown)
+        pointer = 0
+        while pointer < len(self.program):
+            if pointer in spans:
+                end, directive = spans[pointer]
+                lines.append('{:6}  {} {}'.format(pointer, directive, ', '.join(map(str, self.program[pointer:end]))))
+                pointer = end
+                continue
+            if pointer not in self.instructions:
+                # written before it runs, so there is nothing to decode here
+                lines.append('{:6}  .patched {}'.format(pointer, self.program[pointer]))
+                pointer += 1
+                continue
+            if pointer in self.blocks:
+                labels = []
+                if pointer in self.frames:
+                    labels.append('frame {}'.format(self.frames[pointer]))
+                if pointer in self.return_addresses:
+                    labels.append('return')
+                lines.append('{}:{}'.format(label(pointer), '  # ' + ', '.join(labels) if labels else ''))
+            instruction = self.instructions[pointer]
+            lines.append('{:6}  {}'.format(pointer, format_instruction(instruction)))
+            pointer += instruction.length
+        return '\n'.join(lines)
+
+
+def regions(addresses: Iterable[int]) -> List[Tuple[int, int]]:
+    found = []
+    for address in sorted(addresses):
+        if found and found[-1][1] == address:
+            found[-1] = (found[-1][0], address + 1)
+        else:
+            found.append((address, address + 1))
+    return found
+
+
+def constant(instruction: Instruction) -> Optional[int]:
+    (mode1, value1), (mode2, value2), _ = instruction.parameters
+    if mode1 != IMMEDIATE_MODE or mode2 != IMMEDIATE_MODE:
+        return None
+    return value1 + value2 if instruction.opcode == 1 else value1 * value2
+
+
+# the instructions after storing a return address jump away and come back right behind the jump
+def jumps_to(decoder: Intcode, pointer: int, return_address: int) -> bool:
+    for _ in range(4):
+        try:
+            instruction = decoder.decode_instruction(pointer)
+        except Exception:
+            return False
+        pointer += instruction.length
+        if instruction.opcode in (5, 6):
+            return pointer == return_address
+        if instruction.opcode == 99:
+            return False
+    return False
+
+
+def label(address: int) -> str:
+    return 'L{}'.format(address)
+
+
+def format_parameter(parameter: Tuple[int, int], target: bool = False) -> str:
+    mode, value = parameter
+    if mode == IMMEDIATE_MODE:
+        return label(value) if target else str(value)
+    if mode == RELATIVE_MODE:
+        return '[rb{:+}]'.format(value)
+    if mode == POSITION_MODE:
+        return '[{}]'.format(value)
+    raise Exception('non existing mode was called, mode was: {}'.format(mode))
+
+
+def format_instruction(instruction: Instruction) -> str:
+    parameters = [
+        format_parameter(parameter, instruction.opcode in (5, 6) and shift == 1)
+        for shift, parameter in enumerate(instruction.parameters)
+    ]
+    return ' '.join([mnemonics[instruction.opcode]] + [', '.join(parameters)]).strip()
+
+
+if __name__ == '__main__':
+    print(Analysis(read_data(*sys.argv[1:])).disassemble())
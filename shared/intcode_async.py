@@ -0,0 +1,57 @@
+import asyncio
+from typing import Optional, Iterable, Callable
+
+from shared.intcode import Intcode
+
+
+# Runs an Intcode VM as a coroutine: when the program needs input it awaits the
+# inputs queue, and every output is put into the outputs queue, so the event
+# loop only resumes VMs that received something to work on.
+class AsyncIntcode:
+    def __init__(self, intcode: Intcode, inputs: Optional[asyncio.Queue] = None,
+                 outputs: Optional[asyncio.Queue] = None, idle_input: Optional[int] = None,
+                 on_idle: Optional[Callable[[], None]] = None):
+        self.intcode = intcode
+        self.inputs = asyncio.Queue() if inputs is None else inputs
+        self.outputs = asyncio.Queue() if outputs is None else outputs
+        # programs that poll for input (like the day 23 NIC) get this value
+        # instead of waiting, until a poll produces nothing
+        self.idle_input = idle_input
+        # called every time the VM starts waiting for input (or halts)
+        self.on_idle = on_idle
+        self.idle = False
+
+    async def run(self) -> None:
+        polled = False
+        while True:
+            self.intcode.run_program()
+            produced = self.intcode.output.drain()
+            for value in produced:
+                await self.outputs.put(value)
+            if self.intcode.halted:
+                self.become_idle()
+                return
+            if self.inputs.empty() and self.idle_input is not None and (produced or not polled):
+                # the program may still have work that does not need input
+                polled = True
+                self.intcode.add_input([self.idle_input])
+                await asyncio.sleep(0)
+                continue
+            polled = False
+            if self.inputs.empty():
+                self.become_idle()
+                value = await self.inputs.get()
+                self.idle = False
+                self.intcode.add_input([value])
+            while not self.inputs.empty():
+                self.intcode.add_input([self.inputs.get_nowait()])
+
+    def become_idle(self) -> None:
+        self.idle = True
+        if self.on_idle is not None:
+            self.on_idle()
+
+
+# nothing is running, waiting to be delivered or waiting to be routed
+def all_idle(vms: Iterable[AsyncIntcode]) -> bool:
+    return all(vm.idle and vm.inputs.empty() and vm.outputs.empty() for vm in vms)
@@ -0,0 +1,157 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from shared.intcode import POSITION_MODE, IMMEDIATE_MODE, SELF_WRITE_MODE, MAX_INSTRUCTION_LENGTH, templates, \
+    decode_template
+
+# extra memory next to the program before the first resize
+HEADROOM = 1024
+# operands up to this size can be multiplied without leaving 64 bit
+MULTIPLY_LIMIT = 3037000499
+
+
+# Runs one program on many lanes at once: memory is a (lanes, size) array and
+# every step executes the instruction at the lowest instruction pointer for all
+# lanes that are at that pointer, so diverged lanes get a chance to rejoin.
+# Values are int64: unlike Intcode, results that do not fit in 64 bit raise.
+# Every lane can have a different number of inputs, the rows are padded.
+class BatchIntcode:
+    def __init__(self, instructions: Sequence[int], inputs: Optional[Sequence[Sequence[int]]] = None,
+                 lanes: Optional[int] = None):
+        if inputs is None:
+            inputs = [[] for _ in range(lanes or 1)]
+        self.inputs, self.input_lengths = padded(inputs)
+        lanes = len(self.inputs)
+        self.memory = np.zeros((lanes, len(instructions) + HEADROOM), dtype=np.int64)
+        self.memory[:, :len(instructions)] = instructions
+        self.pointers = np.zeros(lanes, dtype=np.int64)
+        self.relative_bases = np.zeros(lanes, dtype=np.int64)
+        self.input_pointers = np.zeros(lanes, dtype=np.int64)
+        self.input_required = np.zeros(lanes, dtype=bool)
+        self.halted = np.zeros(lanes, dtype=bool)
+        self.output: List[List[int]] = [[] for _ in range(lanes)]
+
+    def run_program(self) -> List[List[int]]:
+        while True:
+            active = np.flatnonzero(~(self.halted | self.input_required))
+            if len(active) == 0:
+                break
+            pointers = self.pointers[active]
+            pointer = pointers.min()
+            lanes = active[pointers == pointer]
+            self.reserve(np.array([pointer + MAX_INSTRUCTION_LENGTH - 1]))
+            values = self.memory[lanes, pointer]
+            value = values[0]
+            # lanes that rewrote this instruction wait for a later step
+            lanes = lanes[values == value]
+            self.execute(int(pointer), int(value), lanes)
+        return self.output
+
+    def add_input(self, inputs: Sequence[Sequence[int]]) -> None:
+        values, lengths = padded(inputs)
+        if len(values) != len(self.inputs):
+            raise Exception('inputs for {} lanes were given to {} lanes'.format(len(values), len(self.inputs)))
+        width = int((self.input_lengths + lengths).max(initial=0))
+        if width > self.inputs.shape[1]:
+            self.inputs = np.pad(self.inputs, ((0, 0), (0, width - self.inputs.shape[1])))
+        lanes, columns = np.nonzero(np.arange(values.shape[1]) < lengths[:, None])
+        self.inputs[lanes, self.input_lengths[lanes] + columns] = values[lanes, columns]
+        self.input_lengths += lengths
+        self.input_required[:] = False
+
+    def execute(self, pointer: int, value: int, lanes: np.ndarray) -> None:
+        opcode, _, _, modes = templates.get(value) or decode_template(value)
+        if opcode in (1, 2, 7, 8):
+            input1 = self.read(pointer, modes, 1, lanes)
+            input2 = self.read(pointer, modes, 2, lanes)
+            result = batch_operators[opcode](input1, input2).astype(np.int64)
+            if opcode in (1, 2):
+                check_overflow(opcode, input1, input2, result, lanes)
+            self.write(pointer, modes, 3, lanes, result)
+            self.pointers[lanes] += 4
+        elif opcode == 3:
+            available = self.input_pointers[lanes] < self.input_lengths[lanes]
+            self.input_required[lanes[~available]] = True
+            lanes = lanes[available]
+            self.write(pointer, modes, 1, lanes, self.inputs[lanes, self.input_pointers[lanes]])
+            self.input_pointers[lanes] += 1
+            self.pointers[lanes] += 2
+        elif opcode == 4:
+            for lane, output in zip(lanes.tolist(), self.read(pointer, modes, 1, lanes).tolist()):
+                self.output[lane].append(output)
+            self.pointers[lanes] += 2
+        elif opcode in (5, 6):
+            condition = self.read(pointer, modes, 1, lanes) != 0
+            if opcode == 6:
+                condition = ~condition
+            self.pointers[lanes] = np.where(condition, self.read(pointer, modes, 2, lanes), pointer + 3)
+        elif opcode == 9:
+            self.relative_bases[lanes] += self.read(pointer, modes, 1, lanes)
+            self.pointers[lanes] += 2
+        elif opcode == 99:
+            self.halted[lanes] = True
+
+    def read(self, pointer: int, modes, shift: int, lanes: np.ndarray) -> np.ndarray:
+        if modes[shift - 1] == IMMEDIATE_MODE:
+            return self.memory[lanes, pointer + shift]
+        return self.load(lanes, self.address(pointer, modes, shift, lanes))
+
+    def write(self, pointer: int, modes, shift: int, lanes: np.ndarray, values: np.ndarray) -> None:
+        addresses = self.address(pointer, modes, shift, lanes)
+        self.reserve(addresses)
+        self.memory[lanes, addresses] = values
+
+    def address(self, pointer: int, modes, shift: int, lanes: np.ndarray) -> np.ndarray:
+        mode = modes[shift - 1]
+        if mode == SELF_WRITE_MODE:
+            return np.full(len(lanes), pointer + shift, dtype=np.int64)
+        addresses = self.memory[lanes, pointer + shift]
+        if mode == POSITION_MODE:
+            return addresses
+        return addresses + self.relative_bases[lanes]
+
+    def load(self, lanes: np.ndarray, addresses: np.ndarray) -> np.ndarray:
+        self.reserve(addresses)
+        return self.memory[lanes, addresses]
+
+    def reserve(self, addresses: np.ndarray) -> None:
+        if len(addresses) == 0:
+            return
+        if addresses.min() < 0:
+            raise Exception('negative address was accessed, address was: {}'.format(addresses.min()))
+        size = self.memory.shape[1]
+        if addresses.max() >= size:
+            grown = max(2 * size, int(addresses.max()) + 1)
+            self.memory = np.pad(self.memory, ((0, 0), (0, grown - size)))
+
+
+def padded(inputs: Sequence[Sequence[int]]):
+    lengths = np.array([len(values) for values in inputs], dtype=np.int64)
+    rows = np.zeros((len(inputs), int(lengths.max(initial=0))), dtype=np.int64)
+    for lane, values in enumerate(inputs):
+        rows[lane, :len(values)] = values
+    return rows, lengths
+
+
+def check_overflow(opcode: int, input1: np.ndarray, input2: np.ndarray, result: np.ndarray, lanes: np.ndarray) -> None:
+    if opcode == 1:
+        # the sum wrapped when it has a different sign than both operands
+        overflow = ((input1 ^ result) & (input2 ^ result)) < 0
+    else:
+        overflow = (input1 > MULTIPLY_LIMIT) | (input1 < -MULTIPLY_LIMIT) | \
+                   (input2 > MULTIPLY_LIMIT) | (input2 < -MULTIPLY_LIMIT)
+        if overflow.any():
+            # large operands can still have a small product, those are checked exactly
+            exact = [int(value1) * int(value2) for value1, value2 in zip(input1[overflow], input2[overflow])]
+            overflow[overflow] = [not -2 ** 63 <= value < 2 ** 63 for value in exact]
+    if overflow.any():
+        raise Exception('values outside of 64 bit in lanes: {}'.format(lanes[overflow].tolist()))
+
+
+batch_operators = {
+    1: np.add,
+    2: np.multiply,
+    7: np.less,
+    8: np.equal,
+}
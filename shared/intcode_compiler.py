@@ -0,0 +1,181 @@
+from copy import copy
+from typing import List, Iterable, Optional
+
+from shared.intcode import Intcode, Instruction, InputProvider, IMMEDIATE_MODE, RELATIVE_MODE
+
+# straight-line instructions translated into one block at most
+MAX_BLOCK_LENGTH = 64
+
+# translated blocks per (start, instruction words), shared by all programs
+translations = {}
+MAX_TRANSLATIONS = 4096
+
+
+def read_expression(parameter) -> str:
+    mode, value = parameter
+    if mode == IMMEDIATE_MODE:
+        return repr(value)
+    if mode == RELATIVE_MODE:
+        return 'memory[vm.relative_base + {}]'.format(value)
+    return 'memory[{}]'.format(value)
+
+
+def address_expression(parameter) -> str:
+    mode, value = parameter
+    if mode == RELATIVE_MODE:
+        return 'vm.relative_base + {}'.format(value)
+    return repr(value)
+
+
+def may_write_into(parameter, start, end) -> bool:
+    mode, value = parameter
+    return mode == RELATIVE_MODE or start <= value < end
+
+
+def translate_instruction(instruction: Instruction, pointer: int, start: int, end: int) -> List[str]:
+    opcode = instruction.opcode
+    parameters = instruction.parameters
+    following = pointer + instruction.length
+    if opcode in (1, 2, 7, 8):
+        input1, input2 = read_expression(parameters[0]), read_expression(parameters[1])
+        if opcode == 1:
+            value = '{} + {}'.format(input1, input2)
+        elif opcode == 2:
+            value = '{} * {}'.format(input1, input2)
+        elif opcode == 7:
+            value = '1 if {} < {} else 0'.format(input1, input2)
+        else:
+            value = '1 if {} == {} else 0'.format(input1, input2)
+        lines = ['write({}, {})'.format(address_expression(parameters[2]), value)]
+        if may_write_into(parameters[2], start, end):
+            lines += [
+                'if vm.block_invalidated:',
+                '    vm.pointer = {}'.format(following),
+                '    return',
+            ]
+        return lines
+    if opcode == 9:
+        return ['vm.relative_base += {}'.format(read_expression(parameters[0]))]
+    if opcode in (3, 4):
+        # input and output keep using the interpreter, which owns the queues
+        name = 'instruction_{}'.format(pointer)
+        lines = [
+            'vm.pointer = {}'.format(pointer),
+            '{0}.execute(vm, {0})'.format(name),
+        ]
+        return lines + [
+            'if vm.input_required or vm.output_blocked or vm.block_invalidated:',
+            '    return',
+        ]
+    if opcode in (5, 6):
+        condition = read_expression(parameters[0])
+        if opcode == 6:
+            condition = 'not ' + condition
+        return ['vm.pointer = {} if {} else {}'.format(read_expression(parameters[1]), condition, following)]
+    return [
+        'vm.pointer = {}'.format(pointer),
+        'vm.halted = True',
+    ]
+
+
+class CompiledIntcode(Intcode):
+    def __init__(self, instructions, inputs: Iterable[int] = (0,), output_capacity: Optional[int] = None,
+                 input_provider: Optional[InputProvider] = None):
+        super().__init__(instructions, inputs, output_capacity, input_provider)
+        self.blocks = {}
+        self.block_addresses = {}
+        self.interpreted = set()
+        self.block_invalidated = False
+        # the translated blocks are shared with forks until one of them changes them
+        self.blocks_shared = False
+
+    def run_program(self):
+        if self.profiler is not None or self.tracer is not None:
+            return super().run_program()
+        self.output_blocked = False
+        while not self.halted and not self.input_required and not self.output_blocked:
+            pointer = self.pointer
+            if pointer in self.interpreted:
+                self.step()
+                continue
+            block = self.blocks.get(pointer) or self.translate(pointer)
+            self.block_invalidated = False
+            block(self)
+        return self.result()
+
+    def restore(self, snapshot: 'CompiledIntcode') -> None:
+        super().restore(snapshot)
+        self.blocks = snapshot.blocks
+        self.block_addresses = snapshot.block_addresses
+        self.interpreted = snapshot.interpreted
+        self.block_invalidated = False
+        self.blocks_shared = snapshot.blocks_shared = True
+
+    def own_blocks(self) -> None:
+        self.blocks = dict(self.blocks)
+        self.block_addresses = {
+            address: copy(starts)
+            for address, starts in self.block_addresses.items()
+        }
+        self.interpreted = copy(self.interpreted)
+        self.blocks_shared = False
+
+    def invalidate(self, position):
+        super().invalidate(position)
+        if self.blocks_shared:
+            self.own_blocks()
+        for start in self.block_addresses.pop(position, ()):
+            if self.blocks.pop(start, None) is not None:
+                # self-modifying code at this block runs in the interpreter from now on
+                self.interpreted.add(start)
+                self.block_invalidated = True
+
+    def translate(self, start):
+        instructions = []
+        pointer = start
+        while len(instructions) < MAX_BLOCK_LENGTH:
+            try:
+                instruction = self.decode(pointer)
+            except Exception:
+                # not code (yet), the interpreter reports it once it is executed
+                break
+            instructions.append((pointer, instruction))
+            pointer += instruction.length
+            if instruction.opcode in (5, 6, 99):
+                break
+        if not instructions:
+            return self.decode(start)
+        end = pointer
+
+        key = (start, tuple(self.memory.read_range(start, end - start)))
+        block = translations.get(key)
+        if block is None:
+            block = compile_block(instructions, start, end)
+            if len(translations) >= MAX_TRANSLATIONS:
+                translations.clear()
+            translations[key] = block
+
+        if self.blocks_shared:
+            self.own_blocks()
+        self.blocks[start] = block
+        for address in range(start, end):
+            self.block_addresses.setdefault(address, set()).add(start)
+        return block
+
+
+def compile_block(instructions, start, end):
+    body = []
+    for pointer, instruction in instructions:
+        body += translate_instruction(instruction, pointer, start, end)
+    if instructions[-1][1].opcode not in (5, 6, 99):
+        body.append('vm.pointer = {}'.format(end))
+    source = '\n'.join(
+        ['def block(vm):', '    memory = vm.memory', '    write = vm.set_instruction'] +
+        ['    ' + line for line in body]
+    )
+    namespace = {
+        'instruction_{}'.format(pointer): instruction
+        for pointer, instruction in instructions
+    }
+    exec(compile(source, '<intcode block {}>'.format(start), 'exec'), namespace)
+    return namespace['block']
@@ -0,0 +1,238 @@
+from collections import deque
+from itertools import product
+from typing import Dict, Tuple, Union, Optional, Iterable, List
+
+from shared.intcode import IMMEDIATE_MODE, RELATIVE_MODE, SELF_WRITE_MODE, templates, decode_template
+
+# a monomial is a sorted tuple of (symbol, power), the constant term is ()
+Monomial = Tuple[Tuple[str, int], ...]
+
+
+class Polynomial:
+    def __init__(self, terms: Dict[Monomial, int]):
+        self.terms = {monomial: coefficient for monomial, coefficient in terms.items() if coefficient != 0}
+
+    @staticmethod
+    def symbol(name: str) -> 'Polynomial':
+        return Polynomial({((name, 1),): 1})
+
+    def __add__(self, other):
+        if isinstance(other, Unknown):
+            return other
+        terms = dict(self.terms)
+        for monomial, coefficient in as_polynomial(other).terms.items():
+            terms[monomial] = terms.get(monomial, 0) + coefficient
+        return simplify(Polynomial(terms))
+
+    __radd__ = __add__
+
+    def __mul__(self, other):
+        if isinstance(other, Unknown):
+            return other
+        terms = {}
+        for monomial1, coefficient1 in self.terms.items():
+            for monomial2, coefficient2 in as_polynomial(other).terms.items():
+                monomial = multiply_monomials(monomial1, monomial2)
+                terms[monomial] = terms.get(monomial, 0) + coefficient1 * coefficient2
+        return simplify(Polynomial(terms))
+
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        return isinstance(other, (Polynomial, int)) and self.terms == as_polynomial(other).terms
+
+    def __hash__(self):
+        return hash(frozenset(self.terms.items()))
+
+    def symbols(self) -> List[str]:
+        return sorted({name for monomial in self.terms for name, _ in monomial})
+
+    def degree(self) -> int:
+        return max(sum(power for _, power in monomial) for monomial in self.terms)
+
+    def is_affine(self) -> bool:
+        return self.degree() <= 1
+
+    def coefficient(self, name: str) -> int:
+        return self.terms.get(((name, 1),), 0)
+
+    def constant(self) -> int:
+        return self.terms.get((), 0)
+
+    def evaluate(self, values: Dict[str, int]) -> int:
+        total = 0
+        for monomial, coefficient in self.terms.items():
+            for name, power in monomial:
+                coefficient *= values[name] ** power
+            total += coefficient
+        return total
+
+    def __repr__(self):
+        terms = []
+        for monomial, coefficient in sorted(self.terms.items(), key=lambda term: (-len(term[0]), term[0])):
+            factors = [name if power == 1 else '{}^{}'.format(name, power) for name, power in monomial]
+            if coefficient != 1 or not factors:
+                factors.insert(0, str(coefficient))
+            terms.append('*'.join(factors))
+        return ' + '.join(terms).replace('+ -', '- ')
+
+
+# a value read through an address that depends on symbols, it poisons every result it flows into
+class Unknown:
+    def __add__(self, other):
+        return self
+
+    __radd__ = __mul__ = __rmul__ = __add__
+
+    def __repr__(self):
+        return 'unknown'
+
+
+unknown = Unknown()
+Value = Union[int, Polynomial, Unknown]
+
+
+def as_polynomial(value: Union[int, Polynomial]) -> Polynomial:
+    return value if isinstance(value, Polynomial) else Polynomial({(): value})
+
+
+def simplify(polynomial: Polynomial) -> Union[int, Polynomial]:
+    if not polynomial.terms:
+        return 0
+    if list(polynomial.terms) == [()]:
+        return polynomial.terms[()]
+    return polynomial
+
+
+def multiply_monomials(monomial1: Monomial, monomial2: Monomial) -> Monomial:
+    powers = dict(monomial1)
+    for name, power in monomial2:
+        powers[name] = powers.get(name, 0) + power
+    return tuple(sorted(powers.items()))
+
+
+def symbol(name: str) -> Polynomial:
+    return Polynomial.symbol(name)
+
+
+# Runs a program where some memory cells or inputs are symbols: arithmetic on
+# them builds polynomials, so the result of a run is a formula in the symbols.
+# Jumps, comparisons, addresses and instructions have to stay concrete.
+class SymbolicIntcode:
+    def __init__(self, instructions, symbols: Optional[Dict[int, str]] = None, inputs: Iterable[Value] = ()):
+        self.memory: Dict[int, Value] = dict(enumerate(instructions))
+        for address, name in (symbols or {}).items():
+            self.memory[address] = symbol(name)
+        self.inputs = deque(inputs)
+        self.output: List[Value] = []
+        self.pointer = 0
+        self.relative_base = 0
+        self.input_required = False
+        self.halted = False
+
+    def run_program(self):
+        while not self.halted and not self.input_required:
+            self.step()
+        return self.result()
+
+    def result(self):
+        if len(self.output) == 0:
+            return self.memory.get(0, 0)
+        else:
+            return self.output
+
+    def add_input(self, values: Iterable[Value]) -> None:
+        self.inputs.extend(values)
+        self.input_required = False
+
+    def step(self):
+        value = self.concrete(self.memory.get(self.pointer, 0), 'instruction')
+        opcode, _, _, modes = templates.get(value) or decode_template(value)
+        if opcode in (1, 2):
+            input1, input2 = self.read(modes, 1), self.read(modes, 2)
+            self.write(modes, 3, input1 + input2 if opcode == 1 else input1 * input2)
+            self.pointer += 4
+        elif opcode == 3:
+            if not self.inputs:
+                self.input_required = True
+                return
+            self.write(modes, 1, self.inputs.popleft())
+            self.pointer += 2
+        elif opcode == 4:
+            self.output.append(self.read(modes, 1))
+            self.pointer += 2
+        elif opcode in (5, 6):
+            condition = self.concrete(self.read(modes, 1), 'jump condition')
+            if (condition != 0) == (opcode == 5):
+                self.pointer = self.concrete(self.read(modes, 2), 'jump target')
+            else:
+                self.pointer += 3
+        elif opcode in (7, 8):
+            input1 = self.concrete(self.read(modes, 1), 'comparison')
+            input2 = self.concrete(self.read(modes, 2), 'comparison')
+            self.write(modes, 3, int(input1 < input2 if opcode == 7 else input1 == input2))
+            self.pointer += 4
+        elif opcode == 9:
+            self.relative_base += self.concrete(self.read(modes, 1), 'relative base')
+            self.pointer += 2
+        else:
+            self.halted = True
+
+    def concrete(self, value: Value, usage: str) -> int:
+        if not isinstance(value, int):
+            raise Exception('{} depends on symbols at {}, value was: {}'.format(usage, self.pointer, value))
+        return value
+
+    def read(self, modes, shift: int) -> Value:
+        parameter = self.memory.get(self.pointer + shift, 0)
+        mode = modes[shift - 1]
+        if mode == IMMEDIATE_MODE:
+            return parameter
+        if not isinstance(parameter, int):
+            return unknown
+        if mode == RELATIVE_MODE:
+            parameter += self.relative_base
+        if parameter < 0:
+            raise Exception('negative address was accessed, address was: {}'.format(parameter))
+        return self.memory.get(parameter, 0)
+
+    def write(self, modes, shift: int, value: Value) -> None:
+        mode = modes[shift - 1]
+        if mode == SELF_WRITE_MODE:
+            address = self.pointer + shift
+        else:
+            address = self.concrete(self.memory.get(self.pointer + shift, 0), 'write address')
+            if mode == RELATIVE_MODE:
+                address += self.relative_base
+        if address < 0:
+            raise Exception('negative address was written, address was: {}'.format(address))
+        self.memory[address] = value
+
+
+# finds values from the domains for which expression == target, without running anything:
+# an affine expression is solved for its last symbol, anything else is evaluated
+def solve(expression: Value, target: int, domains: Dict[str, Iterable[int]]) -> Optional[Dict[str, int]]:
+    if isinstance(expression, Unknown):
+        raise Exception('expression depends on memory at symbolic addresses')
+    if isinstance(expression, int):
+        return {} if expression == target else None
+    names = expression.symbols()
+    missing = [name for name in names if name not in domains]
+    if missing:
+        raise Exception('no domain for symbols: {}'.format(missing))
+    if expression.is_affine():
+        *free, solved = names
+        coefficient = expression.coefficient(solved)
+        allowed = set(domains[solved])
+        for values in product(*[domains[name] for name in free]):
+            assignment = dict(zip(free, values))
+            rest = target - expression.constant() - sum(expression.coefficient(name) * assignment[name] for name in free)
+            if rest % coefficient == 0 and rest // coefficient in allowed:
+                assignment[solved] = rest // coefficient
+                return assignment
+        return None
+    for values in product(*[domains[name] for name in names]):
+        assignment = dict(zip(names, values))
+        if expression.evaluate(assignment) == target:
+            return assignment
+    return None